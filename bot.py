@@ -5,11 +5,20 @@ import os
 from logging.handlers import RotatingFileHandler
 sys.path.insert(0, '.')
 
+try:
+    import uvloop  # Optional - faster event loop (not available on Windows)
+except ImportError:
+    uvloop = None
+
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
 from config import BOT_TOKEN
-from gpro_calendar import load_calendar_silent
-from notifications import check_notifications, load_users_data  # ADD load_users_data
+from gpro_calendar import load_calendar_silent, close_http_session
+from notifications import (
+    start_notification_checker, stop_notification_checker,
+    start_users_data_compactor, stop_users_data_compactor,
+    load_users_data, save_users_data_async
+)
 from i18n_setup import setup_i18n
 
 # Configure production-ready logging
@@ -32,6 +41,18 @@ logging.getLogger('aiogram.event').setLevel(logging.WARNING)
 
 logger = logging.getLogger(__name__)
 
+async def on_shutdown():
+    # Stop the notification loop first - a tick still running could otherwise
+    # broadcast during teardown or reopen the GPRO HTTP session after it closes
+    await stop_notification_checker()
+    # Stop the periodic compactor so it can't race the final save
+    await stop_users_data_compactor()
+    # Fold pending WAL records into the snapshot while the loop is still running
+    # (the atexit flush stays as a fallback for unclean exits)
+    await save_users_data_async()
+    logger.info("✅ users_data flushed on shutdown")
+    await close_http_session()
+
 async def main():
     if not BOT_TOKEN:
         logger.error("❌ BOT_TOKEN not found!")
@@ -43,6 +64,7 @@ async def main():
 
     bot = Bot(token=BOT_TOKEN)
     dp = Dispatcher(storage=MemoryStorage())
+    dp.shutdown.register(on_shutdown)
 
     # Setup i18n middleware
     i18n = setup_i18n()
@@ -55,8 +77,13 @@ async def main():
     logger.info("✅ Handlers router loaded")
 
     await load_calendar_silent()
-    asyncio.create_task(check_notifications(bot))
+    start_notification_checker(bot)
+    start_users_data_compactor()
     await dp.start_polling(bot)
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    if uvloop is not None and sys.platform != 'win32':
+        logger.info("✅ Using uvloop event loop")
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
@@ -33,3 +33,8 @@ _SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 NEXT_SEASON_FILE = os.path.join(_SCRIPT_DIR, 'next_season_calendar.json')
 CALENDAR_FILE = os.path.join(_SCRIPT_DIR, 'gpro_calendar.json')
 GPRO_API_LANG = 'gb'
+
+# fsync the users_data.json snapshot, notify_history.json and the calendar files before
+# replacing them (set DURABLE_SAVE=false to trade crash durability of the latest write
+# for cheaper saves on slow filesystems)
+DURABLE_SAVE = os.getenv('DURABLE_SAVE', 'true').strip().lower() not in ('0', 'false', 'no')
@@ -1,17 +1,24 @@
-import json
+import bisect
 import logging
 import re
 import os
 import asyncio
 from datetime import datetime, timedelta
 import aiohttp
-from config import GPRO_API_TOKEN, CALENDAR_FILE, GPRO_API_LANG, NEXT_SEASON_FILE
+from config import GPRO_API_TOKEN, CALENDAR_FILE, GPRO_API_LANG, NEXT_SEASON_FILE, DURABLE_SAVE
+from utils import json_dumps, json_loads, fsync_dir
 
 logger = logging.getLogger(__name__)
 
 # Module-level globals
 race_calendar = {}
 next_season_calendar = {}
+_calendar_version = 0  # Bumped whenever race_calendar is replaced
+_http_session = None  # Shared aiohttp session for GPRO API calls (created lazily on the loop)
+_calendar_save_lock = asyncio.Lock()  # Serializes async calendar file writes
+# Sorted quali close times and matching race_ids, rebuilt with race_calendar
+_quali_close_times = []
+_quali_close_ids = []
 
 # Date parsing formats (in order of priority)
 DATE_FORMATS = [
@@ -29,6 +36,26 @@ RACE_START_MINUTE_UTC = 0
 QUALI_CLOSES_BEFORE_RACE_HOURS = 1.5  # Quali closes 1.5 hours before race
 
 
+def _get_http_session() -> aiohttp.ClientSession:
+    """Shared session for GPRO API calls
+
+    Reusing one session keeps connections (and their TLS handshakes) alive
+    between the frequent quali-status and weather polls.
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        _http_session = aiohttp.ClientSession()
+    return _http_session
+
+
+async def close_http_session():
+    """Close the shared GPRO API session (call on shutdown)"""
+    global _http_session
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    _http_session = None
+
+
 def _load_calendar_from_file(filepath: str) -> dict:
     """Generic calendar loader from JSON file
 
@@ -36,8 +63,8 @@ def _load_calendar_from_file(filepath: str) -> dict:
         dict: Calendar data with datetime objects, or empty dict on error
     """
     try:
-        with open(filepath, 'r') as f:
-            data = json.load(f)
+        with open(filepath, 'rb') as f:
+            data = json_loads(f.read())
             calendar = {}
             for race_id_str, race_data in data.items():
                 race_id = int(race_id_str)
@@ -62,16 +89,8 @@ def _load_calendar_from_file(filepath: str) -> dict:
         return {}
 
 
-def _save_calendar_to_file(calendar: dict, filepath: str):
-    """Generic calendar saver to JSON file with atomic write
-
-    Args:
-        calendar: Calendar dict with datetime objects
-        filepath: Target file path
-
-    Raises:
-        Exception: If save fails
-    """
+def _serialize_calendar(calendar: dict) -> bytes:
+    """Encode a calendar dict (with datetime objects) as JSON bytes"""
     serializable = {}
     for k, v in calendar.items():
         race_data = {
@@ -87,14 +106,27 @@ def _save_calendar_to_file(calendar: dict, filepath: str):
 
         serializable[str(k)] = race_data
 
+    # Compact JSON - the file is rewritten on every weather fetch
+    return json_dumps(serializable)
+
+
+def _write_calendar_file(buf: bytes, filepath: str):
+    """Atomically replace filepath with buf (blocking - fsyncs if DURABLE_SAVE)
+
+    Raises:
+        Exception: If save fails
+    """
     temp_file = filepath + '.tmp'
     try:
-        with open(temp_file, 'w') as f:
-            json.dump(serializable, f, indent=2)
-            f.flush()
-            os.fsync(f.fileno())
+        with open(temp_file, 'wb') as f:
+            f.write(buf)
+            if DURABLE_SAVE:
+                f.flush()
+                os.fsync(f.fileno())
 
         os.replace(temp_file, filepath)
+        if DURABLE_SAVE:
+            fsync_dir(os.path.dirname(os.path.abspath(filepath)))  # Persist the rename itself
         logger.info(f"💾 Saved calendar to {filepath}")
     except Exception as e:
         logger.error(f"Failed to save calendar to {filepath}: {e}")
@@ -106,13 +138,48 @@ def _save_calendar_to_file(calendar: dict, filepath: str):
         raise
 
 
+async def _save_calendar_to_file_async(calendar: dict, filepath: str):
+    """Save a calendar to JSON with an atomic write
+
+    Serializes on the loop, writes and fsyncs in a worker thread.
+
+    Args:
+        calendar: Calendar dict with datetime objects
+        filepath: Target file path
+
+    Raises:
+        Exception: If save fails
+    """
+    # Saves share one temp file - concurrent weather fetches must not interleave them
+    async with _calendar_save_lock:
+        await asyncio.to_thread(_write_calendar_file, _serialize_calendar(calendar), filepath)
+
+
+def _set_race_calendar(calendar: dict):
+    """Replace race_calendar contents in place and bump the calendar version"""
+    global _calendar_version, _quali_close_times, _quali_close_ids
+    race_calendar.clear()
+    race_calendar.update(calendar)
+    _calendar_version += 1
+
+    closing_order = sorted((data['quali_close'], race_id) for race_id, data in calendar.items())
+    _quali_close_times = [close_time for close_time, _ in closing_order]
+    _quali_close_ids = [race_id for _, race_id in closing_order]
+
+
+def get_calendar_version() -> int:
+    """Counter that changes whenever race_calendar is replaced
+
+    Lets callers rebuild indexes derived from race times only when needed.
+    """
+    return _calendar_version
+
+
 async def load_calendar_silent() -> bool:
     """Load from cache ONLY - no API calls"""
     calendar = _load_calendar_from_file(CALENDAR_FILE)
     if calendar:
-        global race_calendar
-        race_calendar.clear()
-        race_calendar.update(calendar)
+        _set_race_calendar(calendar)
         logger.info(f"✅ Loaded {len(calendar)} races from cache")
         return True
     return False
@@ -145,57 +212,55 @@ async def update_calendar() -> bool:
     
     try:
         logger.info("🔄 Updating calendar from GPRO API...")
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers) as resp:
-                if resp.status == 200:
-                    raw_response = await resp.json()
+        session = _get_http_session()
+        async with session.get(url, headers=headers) as resp:
+            if resp.status == 200:
+                raw_response = await resp.json()
                     
-                    # CURRENT SEASON
-                    data = raw_response.get('events', [])
-                    calendar = parse_gpro_events(data, is_next_season=False)
+                # CURRENT SEASON
+                data = raw_response.get('events', [])
+                calendar = parse_gpro_events(data, is_next_season=False)
                     
-                    if calendar:
-                        save_calendar(calendar)
-                        global race_calendar
-                        race_calendar.clear()
-                        race_calendar.update(calendar)
-                        logger.info(f"✅ CURRENT SEASON: {len(calendar)} races!")
-                    else:
-                        logger.warning("No valid race events found")
+                if calendar:
+                    await _save_calendar_to_file_async(calendar, CALENDAR_FILE)
+                    _set_race_calendar(calendar)
+                    logger.info(f"✅ CURRENT SEASON: {len(calendar)} races!")
+                else:
+                    logger.warning("No valid race events found")
                     
-                    # NEXT SEASON LOGIC
-                    next_season_published = raw_response.get("nextSeasonPublished", False)
-                    logger.info(f"📊 API nextSeasonPublished: {next_season_published}")
+                # NEXT SEASON LOGIC
+                next_season_published = raw_response.get("nextSeasonPublished", False)
+                logger.info(f"📊 API nextSeasonPublished: {next_season_published}")
                     
-                    if next_season_published:
-                        next_events = raw_response.get("nextSeasonEvents", [])
-                        logger.info(f"📊 Found {len(next_events)} nextSeasonEvents")
+                if next_season_published:
+                    next_events = raw_response.get("nextSeasonEvents", [])
+                    logger.info(f"📊 Found {len(next_events)} nextSeasonEvents")
                         
-                        if next_events:
-                            next_calendar = parse_gpro_events(next_events, is_next_season=True)
-                            if next_calendar:
-                                save_next_season_calendar(next_calendar)
-                                global next_season_calendar
-                                next_season_calendar.clear()
-                                next_season_calendar.update(next_calendar)
-                                logger.info(f"🌟 NEXT SEASON: {len(next_calendar)} races populated!")
-                            else:
-                                logger.warning("No valid next season events")
+                    if next_events:
+                        next_calendar = parse_gpro_events(next_events, is_next_season=True)
+                        if next_calendar:
+                            await _save_calendar_to_file_async(next_calendar, NEXT_SEASON_FILE)
+                            global next_season_calendar
+                            next_season_calendar.clear()
+                            next_season_calendar.update(next_calendar)
+                            logger.info(f"🌟 NEXT SEASON: {len(next_calendar)} races populated!")
                         else:
-                            logger.warning("nextSeasonPublished=true but no nextSeasonEvents")
+                            logger.warning("No valid next season events")
                     else:
-                        # FORCE CLEANUP
-                        next_season_calendar.clear()
+                        logger.warning("nextSeasonPublished=true but no nextSeasonEvents")
+                else:
+                    # FORCE CLEANUP
+                    next_season_calendar.clear()
                         
-                        if os.path.exists(NEXT_SEASON_FILE):
-                            os.remove(NEXT_SEASON_FILE)
-                            logger.info("🗑️ Next season file REMOVED - API says not published")
-                        else:
-                            logger.info("ℹ️ No next season file (already clean)")
+                    if os.path.exists(NEXT_SEASON_FILE):
+                        os.remove(NEXT_SEASON_FILE)
+                        logger.info("🗑️ Next season file REMOVED - API says not published")
+                    else:
+                        logger.info("ℹ️ No next season file (already clean)")
                     
-                    return True
-                else:
-                    logger.error(f"API {resp.status}")
+                return True
+            else:
+                logger.error(f"API {resp.status}")
     except Exception as e:
         logger.error(f"Calendar update error: {e}")
     
@@ -298,14 +363,6 @@ def parse_gpro_date_fixed(date_str: str) -> datetime:
     logger.warning(f"Cannot parse date: '{date_str}'")
     return None
 
-def save_calendar(calendar: dict):
-    """Save current season calendar with atomic write to prevent corruption"""
-    _save_calendar_to_file(calendar, CALENDAR_FILE)
-
-def save_next_season_calendar(calendar: dict):
-    """Save next season calendar with atomic write to prevent corruption"""
-    _save_calendar_to_file(calendar, NEXT_SEASON_FILE)
-
 async def check_quali_status_from_api() -> dict:
     """Check real-time qualification status from GPRO /office endpoint
 
@@ -322,33 +379,35 @@ async def check_quali_status_from_api() -> dict:
     }
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, timeout=10) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-                    seconds_left = data.get('secondsLeftQual')
-
-                    if seconds_left and int(seconds_left) > 0:
-                        # Figure out which race this quali is for
-                        # by matching quali close time
-                        seconds = int(seconds_left)
-                        now = datetime.utcnow()
-                        expected_close = now + timedelta(seconds=seconds)
-
-                        # Find matching race (within 1 hour tolerance)
-                        for race_id, race_data in race_calendar.items():
-                            time_diff = abs((race_data['quali_close'] - expected_close).total_seconds())
-                            if time_diff < 3600:  # Within 1 hour
-                                logger.info(f"✅ API: Race {race_id} quali open, {seconds//3600}h remaining")
-                                return {race_id: seconds}
-
-                        logger.debug(f"API returned secondsLeftQual={seconds} but no matching race found")
-                    else:
-                        logger.debug("API: No active qualification")
-                    return {}
+        session = _get_http_session()
+        async with session.get(url, headers=headers, timeout=10) as resp:
+            if resp.status == 200:
+                data = await resp.json()
+                seconds_left = data.get('secondsLeftQual')
+
+                if seconds_left and int(seconds_left) > 0:
+                    # Figure out which race this quali is for
+                    # by matching quali close time
+                    seconds = int(seconds_left)
+                    now = datetime.utcnow()
+                    expected_close = now + timedelta(seconds=seconds)
+
+                    # Find matching race (within 1 hour tolerance) by binary
+                    # searching the sorted close-time index
+                    tolerance = timedelta(hours=1)
+                    idx = bisect.bisect_right(_quali_close_times, expected_close - tolerance)
+                    if idx < len(_quali_close_times) and _quali_close_times[idx] < expected_close + tolerance:
+                        race_id = _quali_close_ids[idx]
+                        logger.info(f"✅ API: Race {race_id} quali open, {seconds//3600}h remaining")
+                        return {race_id: seconds}
+
+                    logger.debug(f"API returned secondsLeftQual={seconds} but no matching race found")
                 else:
-                    logger.warning(f"Office API returned {resp.status}")
-                    return {}
+                    logger.debug("API: No active qualification")
+                return {}
+            else:
+                logger.warning(f"Office API returned {resp.status}")
+                return {}
     except asyncio.TimeoutError:
         logger.warning("Office API timeout")
         return {}
@@ -376,29 +435,29 @@ async def fetch_weather_from_api(race_id: int) -> dict:
     }
 
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=headers, timeout=10) as resp:
-                if resp.status == 200:
-                    data = await resp.json()
-
-                    # Extract just the weather data from the response
-                    weather_data = data.get('weather', {})
-
-                    if weather_data:
-                        logger.info(f"🌤️ Weather API: Successfully fetched data for race {race_id}")
-                        # Store weather data in race_calendar
-                        if race_id in race_calendar:
-                            race_calendar[race_id]['weather'] = weather_data
-                            # Save to file to persist weather across restarts
-                            save_calendar(race_calendar)
-                            logger.debug(f"Weather data persisted to file for race {race_id}")
-                    else:
-                        logger.warning(f"Weather API returned data but no 'weather' key found for race {race_id}")
-
-                    return weather_data
+        session = _get_http_session()
+        async with session.get(url, headers=headers, timeout=10) as resp:
+            if resp.status == 200:
+                data = await resp.json()
+
+                # Extract just the weather data from the response
+                weather_data = data.get('weather', {})
+
+                if weather_data:
+                    logger.info(f"🌤️ Weather API: Successfully fetched data for race {race_id}")
+                    # Store weather data in race_calendar
+                    if race_id in race_calendar:
+                        race_calendar[race_id]['weather'] = weather_data
+                        # Save to file to persist weather across restarts
+                        await _save_calendar_to_file_async(race_calendar, CALENDAR_FILE)
+                        logger.debug(f"Weather data persisted to file for race {race_id}")
                 else:
-                    logger.warning(f"Weather API returned {resp.status}")
-                    return {}
+                    logger.warning(f"Weather API returned data but no 'weather' key found for race {race_id}")
+
+                return weather_data
+            else:
+                logger.warning(f"Weather API returned {resp.status}")
+                return {}
     except asyncio.TimeoutError:
         logger.warning("Weather API timeout")
         return {}
@@ -406,19 +465,15 @@ async def fetch_weather_from_api(race_id: int) -> dict:
         logger.error(f"Weather API error: {e}")
         return {}
 
-def get_races_closing_soon(hours_before: float = 720) -> dict:
-    """Get races closing within 30 days - SORTED by time!"""
-    now = datetime.utcnow()
-    upcoming = {}
-
-    for race_id, data in race_calendar.items():
-        time_to_close = (data['quali_close'] - now).total_seconds() / 3600
-        if 0 < time_to_close <= hours_before:
-            data_copy = data.copy()
-            data_copy['hours_left'] = time_to_close
-            upcoming[race_id] = data_copy
-
-    # Sort by closest first
-    sorted_upcoming = dict(sorted(upcoming.items(), key=lambda x: x[1]['hours_left']))
-    logger.debug(f"Upcoming races ({len(sorted_upcoming)}): {list(sorted_upcoming.keys())}")
-    return sorted_upcoming
+def get_quali_closing_hours(hours_before: float, now: datetime) -> list:
+    """[(race_id, hours_left), ...] for quali closing in (now, now + hours_before], closest first
+
+    Binary searches the sorted close-time index and returns only ids and
+    hours - callers look race data up in race_calendar themselves.
+    """
+    start = bisect.bisect_right(_quali_close_times, now)
+    end = bisect.bisect_right(_quali_close_times, now + timedelta(hours=hours_before))
+    return [
+        (race_id, (close_time - now).total_seconds() / 3600)
+        for close_time, race_id in zip(_quali_close_times[start:end], _quali_close_ids[start:end])
+    ]
@@ -7,8 +7,9 @@ from aiogram_i18n import I18nContext
 
 from gpro_calendar import race_calendar
 from notifications import (
-    get_user_status, toggle_notification, mark_quali_done, reset_user_status,
-    save_users_data, get_user_language, set_user_language, LANGUAGE_OPTIONS,
+    get_user_status, toggle_notification, set_all_notifications, mark_quali_done, reset_user_status,
+    get_notification_preferences,
+    get_user_language, set_user_language, LANGUAGE_OPTIONS,
     get_custom_notifications, set_custom_notification,
     format_custom_notification_time, CUSTOM_NOTIF_MIN_HOURS, CUSTOM_NOTIF_MAX_HOURS,
     format_weather_data, set_user_ui_language, get_user_ui_language
@@ -31,6 +32,11 @@ NOTIFICATION_LABELS = {
     'race_results': 'Race results available'
 }
 
+# Static keyboard for the custom notification time prompt
+_CUSTOM_NOTIF_CANCEL_KB = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="❌ Cancel", callback_data="custom_notif_menu")]
+])
+
 
 def build_language_keyboard(page: int = 1, current_lang: str = 'gb', onboarding: bool = False, i18n=None) -> InlineKeyboardMarkup:
     """Build paginated language selection keyboard
@@ -231,21 +237,20 @@ async def handle_toggle_notification(callback: CallbackQuery):
 
     # Handle "Enable All" / "Disable All"
     if callback.data == "toggle_all_on":
+        set_all_notifications(user_id, True)
         user_status = get_user_status(user_id)
-        for notif_type in user_status['notifications'].keys():
-            user_status['notifications'][notif_type] = True
-        save_users_data()
         feedback_text = "✅ All notifications enabled!"
     elif callback.data == "toggle_all_off":
+        set_all_notifications(user_id, False)
         user_status = get_user_status(user_id)
-        for notif_type in user_status['notifications'].keys():
-            user_status['notifications'][notif_type] = False
-        save_users_data()
         feedback_text = "🔕 All notifications disabled!"
     else:
         # Toggle individual notification
         notification_type = callback.data.replace("toggle_", "")
         new_state = toggle_notification(user_id, notification_type)
+        if new_state is None:
+            await callback.answer()  # Unknown type (stale or forged button)
+            return
 
         status_text = "enabled" if new_state else "disabled"
         feedback_text = f"✅ {NOTIFICATION_LABELS[notification_type]} {status_text}!"
@@ -253,7 +258,7 @@ async def handle_toggle_notification(callback: CallbackQuery):
         user_status = get_user_status(user_id)
 
     # Rebuild the notification sub-menu with updated states (user_status already fetched above)
-    notifications = user_status.get('notifications', {})
+    notifications = get_notification_preferences(user_status)
 
     keyboard_buttons = []
     for notif_type, label in NOTIFICATION_LABELS.items():
@@ -611,7 +616,7 @@ async def handle_notifications_menu(callback: CallbackQuery, i18n: I18nContext):
     """Show notifications sub-menu"""
     user_id = callback.from_user.id
     user_status = get_user_status(user_id)
-    notifications = user_status.get('notifications', {})
+    notifications = get_notification_preferences(user_status)
 
     # Build notification toggles keyboard
     keyboard_buttons = []
@@ -831,9 +836,7 @@ async def handle_custom_notification_input_prompt(callback: CallbackQuery, state
     await state.update_data(slot_index=slot_idx)
     await state.set_state(CustomNotificationStates.waiting_for_time)
 
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="❌ Cancel", callback_data="custom_notif_menu")]
-    ])
+    keyboard = _CUSTOM_NOTIF_CANCEL_KB
 
     await callback.message.edit_text(
         f"⏱️ **Custom Notification {slot_idx+1}**\n\n"
@@ -13,7 +13,8 @@ from gpro_calendar import (
 )
 from notifications import (
     get_user_status, reset_user_status, send_quali_notification,
-    save_users_data, users_data, set_user_ui_language
+    users_data, set_user_ui_language, blocked_users,
+    wake_notification_checker
 )
 from utils import format_full_calendar
 from config import ADMIN_USER_IDS
@@ -33,6 +34,9 @@ async def cmd_start(message: Message, state: FSMContext, i18n: I18nContext):
     was_new = user_id not in users_data
     get_user_status(user_id)
 
+    # A returning user may have unblocked the bot - resume broadcasts
+    blocked_users.discard(user_id)
+
     if was_new:
         logger.info(f"🆕 NEW user {user_id} registered via /start")
         # Show bot UI language selection first (new step!)
@@ -193,9 +197,11 @@ async def cmd_update(message: Message, i18n: I18nContext):
         return
 
     await update_calendar()
+    # Re-check right away against the new race times
+    wake_notification_checker()
 
     reset_count = 0
-    for user_id in list(users_data.keys()):
+    for user_id in tuple(users_data):
         reset_user_status(user_id)
         reset_count += 1
 
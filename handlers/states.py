@@ -1,6 +1,7 @@
 """FSM state handlers and state group definitions"""
 import logging
 import re
+from functools import lru_cache
 from aiogram import F
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.fsm.context import FSMContext
@@ -14,6 +15,22 @@ from . import router
 logger = logging.getLogger(__name__)
 
 
+# GPRO group code: E or M/P/A/R followed by 1-3 digits
+_GROUP_RE = re.compile(r'^[MPAR]\d{1,3}$')
+
+
+def _normalize_group_input(text: str) -> str:
+    """Trim and upper-case group input, skipping both when it is already clean"""
+    if text[:1].isspace() or text[-1:].isspace():
+        text = text.strip()
+    return text if text.isupper() else text.upper()
+
+
+def _is_valid_group(group_input: str) -> bool:
+    """Check that an upper-cased group code has a valid format"""
+    return group_input == 'E' or _GROUP_RE.match(group_input) is not None
+
+
 class SetGroupStates(StatesGroup):
     waiting_for_group = State()
 
@@ -27,17 +44,43 @@ class OnboardingStates(StatesGroup):
     waiting_for_group = State()
 
 
+# Reply keyboards below are static per locale - cache them by button text
+@lru_cache(maxsize=32)
+def _back_to_settings_kb(button_text: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=button_text, callback_data="settings_main")]
+    ])
+
+
+@lru_cache(maxsize=32)
+def _custom_notif_success_kb(button_text: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=button_text, callback_data="custom_notif_menu")]
+    ])
+
+
+@lru_cache(maxsize=32)
+def _custom_notif_retry_kb(try_again_text: str, back_text: str, slot_idx: int) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=try_again_text, callback_data=f"custom_notif_input_{slot_idx}")],
+        [InlineKeyboardButton(text=back_text, callback_data="custom_notif_menu")]
+    ])
+
+
+@lru_cache(maxsize=32)
+def _onboarding_complete_kb(button_text: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=button_text, callback_data="onboard_complete")]
+    ])
+
+
 @router.message(SetGroupStates.waiting_for_group, F.text & ~F.text.startswith('/'))
 async def process_group_input(message: Message, state: FSMContext, i18n: I18nContext):
     """Process user's group input from settings"""
-    group_input = message.text.strip().upper()
+    group_input = _normalize_group_input(message.text)
 
     # Validate format: E or M/P/A/R followed by 1-3 digits
-    if group_input == 'E':
-        valid = True
-    elif re.match(r'^[MPAR]\d{1,3}$', group_input):
-        valid = True
-    else:
+    if not _is_valid_group(group_input):
         await message.answer(
             i18n.get("error-invalid-format"),
             parse_mode='Markdown'
@@ -50,9 +93,7 @@ async def process_group_input(message: Message, state: FSMContext, i18n: I18nCon
     await state.clear()
 
     # Show success with back to settings button
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=i18n.get("button-back-to-settings"), callback_data="settings_main")]
-    ])
+    keyboard = _back_to_settings_kb(i18n.get("button-back-to-settings"))
 
     await message.answer(
         i18n.get("settings-group-set", group=group_display),
@@ -88,9 +129,7 @@ async def process_custom_notification_time_input(message: Message, state: FSMCon
     await state.clear()
 
     if success:
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=i18n.get("button-back-custom-notif"), callback_data="custom_notif_menu")]
-        ])
+        keyboard = _custom_notif_success_kb(i18n.get("button-back-custom-notif"))
 
         await message.answer(
             i18n.get("custom-notif-success", message=result_msg),
@@ -98,10 +137,7 @@ async def process_custom_notification_time_input(message: Message, state: FSMCon
             parse_mode='Markdown'
         )
     else:
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
-            [InlineKeyboardButton(text=i18n.get("button-try-again"), callback_data=f"custom_notif_input_{slot_idx}")],
-            [InlineKeyboardButton(text=i18n.get("button-back"), callback_data="custom_notif_menu")]
-        ])
+        keyboard = _custom_notif_retry_kb(i18n.get("button-try-again"), i18n.get("button-back"), slot_idx)
 
         await message.answer(
             i18n.get("custom-notif-error-setting", error=result_msg),
@@ -114,14 +150,10 @@ async def process_custom_notification_time_input(message: Message, state: FSMCon
 async def process_onboarding_group_input(message: Message, state: FSMContext, i18n: I18nContext):
     """Process custom group input during onboarding"""
     user_id = message.from_user.id
-    group_input = message.text.strip().upper()
+    group_input = _normalize_group_input(message.text)
 
     # Validate format
-    if group_input == 'E':
-        valid = True
-    elif re.match(r'^[MPAR]\d{1,3}$', group_input):
-        valid = True
-    else:
+    if not _is_valid_group(group_input):
         await message.answer(
             i18n.get("error-invalid-format-onboarding"),
             parse_mode='Markdown'
@@ -134,9 +166,7 @@ async def process_onboarding_group_input(message: Message, state: FSMContext, i1
     await state.clear()
 
     # Show welcome complete message
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text=i18n.get("button-got-it"), callback_data="onboard_complete")]
-    ])
+    keyboard = _onboarding_complete_kb(i18n.get("button-got-it"))
 
     await message.answer(
         i18n.get("onboard-complete-with-group", group=group_display),
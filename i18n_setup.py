@@ -29,13 +29,16 @@ class UserLanguageManager(BaseManager):
             str: Language code ('en' or 'ru')
         """
         # Import here to avoid circular dependency
-        from notifications import get_user_status
+        from notifications import get_user_status_fast
 
         if not event_from_user:
             return DEFAULT_UI_LANGUAGE
 
-        user_id = event_from_user.id
-        user_status = get_user_status(user_id)
+        # Read-only lookup: runs for every update, and must not register the
+        # user before /start gets to check whether they are new
+        user_status = get_user_status_fast(event_from_user.id)
+        if user_status is None:
+            return DEFAULT_UI_LANGUAGE
 
         # Get UI language (separate from GPRO language)
         ui_lang = user_status.get('ui_lang', DEFAULT_UI_LANGUAGE)
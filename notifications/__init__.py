@@ -8,10 +8,20 @@ from .user_data import (
     users_data,
     load_users_data,
     save_users_data,
+    save_users_data_async,
+    save_user,
+    start_users_data_compactor,
+    stop_users_data_compactor,
     get_user_status,
+    get_user_status_fast,
     set_user_group,
     toggle_notification,
+    set_all_notifications,
     is_notification_enabled,
+    get_notification_preferences,
+    get_disabled_users,
+    get_custom_notifications_between,
+    set_custom_notification_slot,
     set_user_language,
     get_user_language,
     set_user_ui_language,
@@ -34,12 +44,12 @@ from .validation import (
 
 from .sender import (
     send_quali_notification,
-    send_race_live_notification,
-    send_race_replay_notification,
-    send_race_results_notification,
-    format_weather_data
+    format_weather_data,
+    blocked_users
 )
 
-from .checker import check_notifications
+from .checker import (
+    check_notifications, start_notification_checker, stop_notification_checker, wake_notification_checker
+)
 
 logger.info("✅ notifications module loaded")
@@ -1,28 +1,42 @@
 """Main notification checking loop and helper functions"""
 import asyncio
+import bisect
+import heapq
 import logging
+import os
+import time
+from collections import OrderedDict, defaultdict
 from datetime import datetime, timedelta
+from typing import Optional
 from aiogram import Bot
 
+from config import DURABLE_SAVE
 from gpro_calendar import (
-    get_races_closing_soon, race_calendar,
+    get_quali_closing_hours, race_calendar, get_calendar_version,
     check_quali_status_from_api, fetch_weather_from_api
 )
-from .user_data import users_data, is_notification_enabled, load_users_data
+from .user_data import (
+    users_data, DEFAULT_USER_LANG, get_disabled_users,
+    get_custom_notifications_between
+)
 from .sender import (
-    send_quali_notification, send_race_live_notification,
-    send_race_replay_notification, send_race_results_notification
+    render_quali_notification,
+    render_race_live_notification, render_race_replay_notification,
+    render_race_results_notification, send_rendered_notification, blocked_users
 )
+from utils import json_dumps, json_loads, fsync_dir
 
 logger = logging.getLogger(__name__)
 
 # Notification windows: (hours_before, tolerance_minutes, label)
-NOTIFICATION_WINDOWS = [
+NOTIFICATION_WINDOWS = (
     (48, 6, "48h"),      # 48h ±6min
     (24, 6, "24h"),      # 24h ±6min
     (2, 5, "2h"),        # 2h ±5min
     (10/60, 2, "10min")  # 10min ±2min
-]
+)
+# Same windows with tolerance pre-converted to hours: (hours_before, tolerance_hours, label)
+_WINDOWS_HOURS = tuple((hours, tolerance_min / 60, label) for hours, tolerance_min, label in NOTIFICATION_WINDOWS)
 
 # Timing constants
 CHECK_INTERVAL_NORMAL_SECONDS = 300  # 5 minutes between checks (normal)
@@ -37,40 +51,214 @@ API_CHECK_START_HOURS = 2  # Start checking API 2 hours after race
 API_CHECK_END_HOURS = 3.5  # Stop checking and send fallback at 3.5 hours
 API_CHECK_INTERVAL_MINUTES = 10  # Check API every 10 minutes
 FALLBACK_TOLERANCE_MINUTES = 15  # Send fallback within 15min of reaching 3.5h
+WEATHER_FETCH_CONCURRENCY = 5  # Parallel weather API requests when several races open at once
 
 # Custom notification tolerance
 CUSTOM_NOTIF_TOLERANCE_MIN = 5  # ±5 minutes tolerance for custom notifications
 
+# Renderers for broadcast types whose text depends on (group, GPRO language)
+_GROUP_RENDERERS = {
+    'live': render_race_live_notification,
+    'replay': render_race_replay_notification,
+    'results': render_race_results_notification,
+}
+
+# Broadcast rate limiting (Telegram allows ~30 msg/s across all chats)
+BROADCAST_MAX_SENDS_PER_SECOND = 25
+
+# Sidecar file so sent-notification history survives restarts
+_SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOTIFY_HISTORY_FILE = os.path.join(_SCRIPT_DIR, 'notify_history.json')
+
 notification_lock = asyncio.Lock()
-notify_history = {}  # {(race_id, window): sent_timestamp}
-last_api_check_time = None  # Track last API check to limit calls
+_broadcast_semaphore = asyncio.Semaphore(BROADCAST_MAX_SENDS_PER_SECOND)
+_weather_semaphore = asyncio.Semaphore(WEATHER_FETCH_CONCURRENCY)
+notify_history: OrderedDict = OrderedDict()  # {(race_id, window): sent_timestamp}, oldest first
+last_api_check_mono: Optional[float] = None  # time.monotonic() of the last API check, to limit calls
+# Event heaps derived from race_calendar, so ticks only touch events that are due
+_closing_events: list = []  # (window_start, window_end, race_id, label)
+_opens_events: list = []  # (polling_start, race_id, prev_race_ts) - quali open detection per race
+_opens_active: dict = {}  # {race_id: prev_race_ts} for races whose polling/fallback span has started
+_opens_confirmed: set = set()  # Active races the API reported open (kept until notify_history has them)
+_live_events: list = []  # (window_start, window_end, race_id)
+_race_starts: list = []  # Sorted race start times (for the adaptive interval)
+_events_version = None  # Calendar version the heaps were built from
+_checker_task: Optional[asyncio.Task] = None  # Running notification loop (one per process)
+_wake_event = asyncio.Event()  # Set to cut the checker's current sleep short
+
+
+def _load_notify_history():
+    """Restore notify_history from the sidecar file (entries older than retention are dropped)"""
+    if not os.path.exists(NOTIFY_HISTORY_FILE):
+        return
+
+    try:
+        with open(NOTIFY_HISTORY_FILE, 'rb') as f:
+            raw_entries = json_loads(f.read())
+        cutoff = datetime.utcnow() - timedelta(days=NOTIFICATION_HISTORY_RETENTION_DAYS)
+        # Entries from one broadcast share a timestamp - parse each distinct one
+        # once, and share the datetime object between those entries
+        parsed_times = {}
+        entries = []
+        for key, sent_at in raw_entries:
+            sent_time = parsed_times.get(sent_at)
+            if sent_time is None:
+                sent_time = parsed_times[sent_at] = datetime.fromisoformat(sent_at)
+            entries.append((tuple(key), sent_time))
+        # Keep oldest-first order so pruning can pop from the front
+        entries.sort(key=lambda entry: entry[1])
+        for key, sent_time in entries:
+            if sent_time > cutoff:
+                # JSON has no tuples - keys come back as lists
+                notify_history[key] = sent_time
+        logger.info(f"✅ Loaded {len(notify_history)} notification history entries")
+    except Exception as e:
+        logger.error(f"Notification history load failed: {e}")
+
+
+def _write_notify_history(data: bytes):
+    """Atomically replace NOTIFY_HISTORY_FILE with data (blocking - runs in a worker thread)"""
+    temp_file = NOTIFY_HISTORY_FILE + '.tmp'
+    try:
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+            if DURABLE_SAVE:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_file, NOTIFY_HISTORY_FILE)
+        if DURABLE_SAVE:
+            fsync_dir(os.path.dirname(NOTIFY_HISTORY_FILE))  # Persist the rename itself
+    except Exception as e:
+        logger.error(f"Notification history save failed: {e}")
+        if os.path.exists(temp_file):
+            try:
+                os.remove(temp_file)
+            except:
+                pass
+
+
+async def _save_notify_history():
+    """Persist notify_history to the sidecar file without blocking the event loop
+
+    Entries are serialized on the loop thread (consistent view), the write
+    and fsync happen in a worker thread.
+    """
+    # Every entry recorded by one broadcast has the same timestamp - format
+    # each distinct one once
+    formatted_times = {}
+    entries = []
+    for key, sent_time in notify_history.items():
+        sent_at = formatted_times.get(sent_time)
+        if sent_at is None:
+            sent_at = formatted_times[sent_time] = sent_time.isoformat()
+        entries.append([list(key), sent_at])
+    await asyncio.to_thread(_write_notify_history, json_dumps(entries))
+
+
+def _prune_notify_history(cutoff: datetime):
+    """Drop history entries sent at or before cutoff
+
+    Entries are inserted with non-decreasing timestamps, so expired ones are
+    always at the front - stop at the first entry that is still fresh.
+    """
+    expired = 0
+    while notify_history:
+        _, sent_time = next(iter(notify_history.items()))
+        if sent_time > cutoff:
+            break
+        notify_history.popitem(last=False)
+        expired += 1
+    if expired:
+        logger.debug("Pruned %d expired notification history entries", expired)
+
+
+def _build_event_indexes(now: datetime):
+    """Rebuild the closing, opens and live event heaps from race_calendar
+
+    Each heap is keyed by the moment its window opens, so a tick only pops
+    events that are actually due. Windows that already passed are left out.
+    """
+    global _closing_events, _opens_events, _opens_active, _opens_confirmed, _live_events, _race_starts, _events_version
+    closing_events = []
+    opens_events = []
+    live_events = []
+    for race_id, race_data in race_calendar.items():
+        quali_close = race_data['quali_close']
+        for hours_before, tolerance_hours, label in _WINDOWS_HOURS:
+            window_end = quali_close - timedelta(hours=hours_before - tolerance_hours)
+            if window_end < now:
+                continue  # Window already passed
+            window_start = quali_close - timedelta(hours=hours_before + tolerance_hours)
+            closing_events.append((window_start, window_end, race_id, label))
+
+        # Quali opens after the previous race (race 1 has none)
+        prev_race_id = race_id - 1
+        if race_id != 1 and prev_race_id in race_calendar:
+            prev_race_time = race_calendar[prev_race_id]['date']
+            fallback_end = prev_race_time + timedelta(hours=API_CHECK_END_HOURS,
+                                                      minutes=FALLBACK_TOLERANCE_MINUTES)
+            if fallback_end >= now:
+                opens_events.append((prev_race_time + timedelta(hours=API_CHECK_START_HOURS), race_id,
+                                     prev_race_time.timestamp()))
+
+        race_time = race_data['date']
+        live_end = race_time + timedelta(minutes=RACE_LIVE_NOTIFICATION_AFTER_MINUTES)
+        if live_end >= now:
+            live_start = race_time - timedelta(minutes=RACE_LIVE_NOTIFICATION_BEFORE_MINUTES)
+            live_events.append((live_start, live_end, race_id))
+
+    for events in (closing_events, opens_events, live_events):
+        heapq.heapify(events)
+    _closing_events = closing_events
+    _opens_events = opens_events
+    _opens_active = {}
+    _opens_confirmed = set()
+    _live_events = live_events
+    _race_starts = sorted(race_data['date'] for race_data in race_calendar.values())
+    _events_version = get_calendar_version()
+
+
+def _ensure_event_indexes(now: datetime):
+    """Rebuild event heaps if race_calendar was replaced since the last build"""
+    if _events_version != get_calendar_version():
+        _build_event_indexes(now)
 
 
 def _check_quali_closing_notifications(now: datetime) -> list:
     """Check for races with qualifying closing soon
 
+    Pops due events off the closing-window heap instead of scanning every
+    race and window each tick. An event only leaves the heap for good once
+    its window passed or it is in notify_history - events that fire now are
+    pushed back, so a failed send is retried on the next tick.
+
     Returns:
         list: Notifications to send [(type, race_id, race_data, label, history_key), ...]
     """
-    notifications = []
-    races_closing = get_races_closing_soon(48)
+    _ensure_event_indexes(now)
 
-    for race_id, race_data in races_closing.items():
-        quali_close = race_data['quali_close']
+    notifications = []
+    pending = []
+    while _closing_events and _closing_events[0][0] <= now:
+        event = heapq.heappop(_closing_events)
+        _, window_end, race_id, label = event
+        # Missed windows (e.g. bot was down) are dropped, same as before
+        if now > window_end or race_id not in race_calendar:
+            continue
 
-        # Check each preset notification window
-        for hours_before, tolerance_min, label in NOTIFICATION_WINDOWS:
-            time_until = (quali_close - now).total_seconds() / 3600
-            target_hours = hours_before
-            tolerance_hours = tolerance_min / 60
+        # notify_history still guards against resending after a restart
+        history_key = (race_id, label)
+        if history_key in notify_history:
+            continue
 
-            # Check if we're in the notification window
-            if abs(time_until - target_hours) <= tolerance_hours:
-                history_key = (race_id, label)
+        race_data = race_calendar[race_id].copy()
+        race_data['hours_left'] = (race_data['quali_close'] - now).total_seconds() / 3600
+        notifications.append(('quali', race_id, race_data, label, history_key))
+        pending.append(event)
 
-                # Only send if not sent before
-                if history_key not in notify_history:
-                    notifications.append(('quali', race_id, race_data, label, history_key))
+    # Kept until notify_history records them (dropped on a later tick)
+    for event in pending:
+        heapq.heappush(_closing_events, event)
 
     return notifications
 
@@ -82,46 +270,78 @@ def _check_custom_notifications(now: datetime) -> list:
         list: Notifications to send [(type, race_id, race_data, label, history_key, user_id), ...]
     """
     notifications = []
-    races_closing = get_races_closing_soon(72)  # Check up to 72 hours (max custom time + buffer)
+    races_closing = get_quali_closing_hours(72, now)  # Check up to 72 hours (max custom time + buffer)
+    if not races_closing:
+        return notifications
+    tolerance_hours = CUSTOM_NOTIF_TOLERANCE_MIN / 60
+    # Race-first: the window each race accepts is the same for every user, so
+    # turn it into [lo, hi] bounds on hours_before once per race
+    race_windows = [
+        (race_id, time_until, time_until - tolerance_hours, time_until + tolerance_hours)
+        for race_id, time_until in races_closing  # hours_left from this cycle's now
+    ]
+    # Race data with this tick's hours_left, copied only for races that fire
+    race_snapshots = {}
+
+    # The sorted slot index hands back only the custom reminders whose
+    # hours_before falls inside a race's window - nobody else is looked at
+    for race_id, time_until, window_lo, window_hi in race_windows:
+        for _, user_id, slot_idx in get_custom_notifications_between(window_lo, window_hi):
+            # Create unique history key for this user+race+custom slot
+            label = f"custom_{slot_idx+1}"
+            history_key = (user_id, race_id, label)
+
+            # Only send if not sent before
+            if history_key not in notify_history:
+                race_data = race_snapshots.get(race_id)
+                if race_data is None:
+                    race_data = race_snapshots[race_id] = dict(race_calendar[race_id], hours_left=time_until)
+                notifications.append(('custom', race_id, race_data, label, history_key, user_id))
 
-    # Check each user's custom notifications
-    for user_id, user_data in users_data.items():
-        custom_notifs = user_data.get('custom_notifications', [])
+    return notifications
 
-        for slot_idx, custom_notif in enumerate(custom_notifs):
-            if not custom_notif.get('enabled', False):
-                continue
 
-            hours_before = custom_notif.get('hours_before')
-            if hours_before is None:
-                continue
+async def _fetch_weather_with_retry(race_id: int):
+    """Fetch weather for a race into race_calendar, retrying once after 5s"""
+    async with _weather_semaphore:
+        weather_data = await fetch_weather_from_api(race_id)
 
-            # Check each race
-            for race_id, race_data in races_closing.items():
-                quali_close = race_data['quali_close']
-                time_until = (quali_close - now).total_seconds() / 3600
+    # Retry once if failed
+    if not weather_data:
+        logger.warning(f"Weather fetch failed for race {race_id}, retrying in 5s...")
+        await asyncio.sleep(5)
+        async with _weather_semaphore:
+            weather_data = await fetch_weather_from_api(race_id)
 
-                # Check if we're within the custom notification window
-                tolerance_hours = CUSTOM_NOTIF_TOLERANCE_MIN / 60
-                if abs(time_until - hours_before) <= tolerance_hours:
-                    # Create unique history key for this user+race+custom slot
-                    label = f"custom_{slot_idx+1}"
-                    history_key = (user_id, race_id, label)
+        if not weather_data:
+            logger.error(f"Weather fetch failed after retry for race {race_id}")
+        else:
+            logger.info(f"Weather fetch succeeded on retry for race {race_id}")
 
-                    # Only send if not sent before
-                    if history_key not in notify_history:
-                        notifications.append(('custom', race_id, race_data, label, history_key, user_id))
 
-    return notifications
+async def _fetch_missing_weather(race_ids: list):
+    """Concurrently fetch weather for the races that don't have it cached yet"""
+    missing = []
+    for race_id in race_ids:
+        if 'weather' in race_calendar[race_id]:
+            logger.debug("Weather data already cached for race %d", race_id)
+        else:
+            missing.append(race_id)
+    if missing:
+        await asyncio.gather(*[_fetch_weather_with_retry(race_id) for race_id in missing])
 
 
-async def _check_quali_open_notifications(now: datetime) -> list:
+async def _check_quali_open_notifications(now: datetime, mono_now: float) -> list:
     """Check for qualifications that just opened using API when appropriate
 
+    Args:
+        now: UTC time captured at the start of this check cycle
+        mono_now: time.monotonic() captured with now (API rate limiting)
+
     Returns:
         list: Notifications to send [(type, race_id, race_data, label, history_key), ...]
     """
-    global last_api_check_time
+    global last_api_check_mono
     notifications = []
 
     # Determine if we should check the API
@@ -129,23 +349,27 @@ async def _check_quali_open_notifications(now: datetime) -> list:
     races_in_polling_window = []
     races_for_fallback = []
 
-    for race_id, race_data in race_calendar.items():
-        # Skip race 1 (no previous race)
-        if race_id == 1:
-            continue
-
-        # Check if already notified
+    # Races enter the active set once their polling window starts and stay
+    # there until notified or past the fallback tolerance
+    _ensure_event_indexes(now)
+    while _opens_events and _opens_events[0][0] <= now:
+        _, race_id, prev_race_ts = heapq.heappop(_opens_events)
+        _opens_active[race_id] = prev_race_ts
+
+    # Float math from here on - no timedelta per active race and tick
+    now_ts = now.timestamp()
+    for race_id, prev_race_ts in sorted(_opens_active.items()):
+        # Check if already notified (the previous race's time came with the
+        # heap entry, so only this race needs a calendar lookup)
         history_key = (race_id, "opens_soon")
-        if history_key in notify_history:
+        if history_key in notify_history or race_id not in race_calendar:
+            del _opens_active[race_id]
+            _opens_confirmed.discard(race_id)
             continue
 
-        # Find previous race
+        race_data = race_calendar[race_id]
         prev_race_id = race_id - 1
-        if prev_race_id not in race_calendar:
-            continue
-
-        prev_race_time = race_calendar[prev_race_id]['date']
-        hours_since_race = (now - prev_race_time).total_seconds() / 3600
+        hours_since_race = (now_ts - prev_race_ts) / 3600.0
 
         # Check if we're in the API polling window (2-3.5 hours after race)
         if API_CHECK_START_HOURS <= hours_since_race <= API_CHECK_END_HOURS:
@@ -156,42 +380,40 @@ async def _check_quali_open_notifications(now: datetime) -> list:
             minutes_since_fallback = (hours_since_race - API_CHECK_END_HOURS) * 60
             if minutes_since_fallback <= FALLBACK_TOLERANCE_MINUTES:
                 races_for_fallback.append((race_id, race_data, prev_race_id, hours_since_race))
+            else:
+                del _opens_active[race_id]  # Fallback window missed
+                _opens_confirmed.discard(race_id)
 
     # Check API if needed (rate limited to every 10 minutes)
-    api_result = {}
     if should_check_api:
         # Only call API every 10 minutes
-        if last_api_check_time is None or (now - last_api_check_time).total_seconds() >= API_CHECK_INTERVAL_MINUTES * 60:
+        # Monotonic clock - immune to wall-clock jumps and no timedelta per tick
+        if last_api_check_mono is None or mono_now - last_api_check_mono >= API_CHECK_INTERVAL_MINUTES * 60:
             logger.info(f"🔍 Checking API for quali open status ({len(races_in_polling_window)} races in window)")
             api_result = await check_quali_status_from_api()
-            last_api_check_time = now
+            last_api_check_mono = mono_now
+            # Remembered, so a send that fails is retried next tick without
+            # waiting for the next rate-limited API call
+            _opens_confirmed.update(
+                race_id for race_id, *_ in races_in_polling_window if race_id in api_result
+            )
         else:
-            time_until_next = API_CHECK_INTERVAL_MINUTES * 60 - (now - last_api_check_time).total_seconds()
-            logger.debug(f"API check skipped (next in {int(time_until_next)}s)")
+            time_until_next = API_CHECK_INTERVAL_MINUTES * 60 - (mono_now - last_api_check_mono)
+            logger.debug("API check skipped (next in %ds)", time_until_next)
+
+    # Weather for every race opening this tick (API-confirmed or fallback),
+    # fetched concurrently so several races don't queue behind each other
+    await _fetch_missing_weather(
+        [race_id for race_id, *_ in races_in_polling_window if race_id in _opens_confirmed]
+        + [race_id for race_id, *_ in races_for_fallback]
+    )
 
     # Process results from API
     for race_id, race_data, prev_race_id, hours_since in races_in_polling_window:
-        if race_id in api_result:
+        if race_id in _opens_confirmed:
             # API confirmed quali is open!
             logger.info(f"🆕 API confirmed: Race {race_id} quali opened!")
 
-            # Fetch weather data with retry (if not already fetched)
-            if 'weather' not in race_calendar[race_id]:
-                weather_data = await fetch_weather_from_api(race_id)
-
-                # Retry once if failed
-                if not weather_data:
-                    logger.warning(f"Weather fetch failed for race {race_id}, retrying in 5s...")
-                    await asyncio.sleep(5)
-                    weather_data = await fetch_weather_from_api(race_id)
-
-                    if not weather_data:
-                        logger.error(f"Weather fetch failed after retry for race {race_id}")
-                    else:
-                        logger.info(f"Weather fetch succeeded on retry for race {race_id}")
-            else:
-                logger.debug(f"Weather data already cached for race {race_id}")
-
             history_key = (race_id, "opens_soon")
             notifications.append(('opens', race_id, race_data, "opens_soon", history_key))
 
@@ -211,23 +433,6 @@ async def _check_quali_open_notifications(now: datetime) -> list:
     for race_id, race_data, prev_race_id, hours_since in races_for_fallback:
         logger.info(f"⏰ Fallback: Sending quali open for race {race_id} at {hours_since:.1f}h (API didn't detect)")
 
-        # Fetch weather data with retry (if not already fetched)
-        if 'weather' not in race_calendar[race_id]:
-            weather_data = await fetch_weather_from_api(race_id)
-
-            # Retry once if failed
-            if not weather_data:
-                logger.warning(f"Weather fetch failed for race {race_id}, retrying in 5s...")
-                await asyncio.sleep(5)
-                weather_data = await fetch_weather_from_api(race_id)
-
-                if not weather_data:
-                    logger.error(f"Weather fetch failed after retry for race {race_id}")
-                else:
-                    logger.info(f"Weather fetch succeeded on retry for race {race_id}")
-        else:
-            logger.debug(f"Weather data already cached for race {race_id}")
-
         history_key = (race_id, "opens_soon")
         notifications.append(('opens', race_id, race_data, "opens_soon", history_key))
 
@@ -254,28 +459,62 @@ def _check_race_live_notifications(now: datetime) -> list:
     """
     notifications = []
 
-    for race_id, race_data in race_calendar.items():
-        race_time = race_data['date']
-        time_since_race = (now - race_time).total_seconds() / 60
+    # Window: RACE_LIVE_NOTIFICATION_BEFORE_MINUTES before to
+    # RACE_LIVE_NOTIFICATION_AFTER_MINUTES after the race starts
+    _ensure_event_indexes(now)
+    pending = []
+    while _live_events and _live_events[0][0] <= now:
+        event = heapq.heappop(_live_events)
+        _, window_end, race_id = event
+        if now > window_end or race_id not in race_calendar:
+            continue
 
-        # Send if we're within window: 5min before to 2min after race starts
-        # This ensures notification is sent early (at 18:55 check for 19:00 race)
-        if -RACE_LIVE_NOTIFICATION_BEFORE_MINUTES <= time_since_race <= RACE_LIVE_NOTIFICATION_AFTER_MINUTES:
-            history_key = (race_id, "race_live")
-            if history_key not in notify_history:
-                notifications.append(('live', race_id, race_data, "race_live", history_key))
+        history_key = (race_id, "race_live")
+        if history_key not in notify_history:
+            notifications.append(('live', race_id, race_calendar[race_id], "race_live", history_key))
+            pending.append(event)
+
+    # Kept until notify_history records them, so a failed send is retried
+    for event in pending:
+        heapq.heappush(_live_events, event)
 
     return notifications
 
 
-async def _send_notifications_to_users(bot: Bot, notifications_to_send: list):
+async def _send_rate_limited(send_coro) -> bool:
+    """Run a single send under the broadcast semaphore
+
+    Each slot is held for at least a second, so concurrency also caps
+    throughput at BROADCAST_MAX_SENDS_PER_SECOND.
+    """
+    async with _broadcast_semaphore:
+        result = await send_coro
+        await asyncio.sleep(1)
+        return result
+
+
+async def _send_notifications_to_users(bot: Bot, notifications_to_send: list, now: datetime):
     """Send notifications to all eligible users
 
+    Messages are grouped per user first, so each user's messages are delivered
+    in order by one worker - however many notifications fire in the same tick,
+    the fan-out runs a fixed pool of BROADCAST_MAX_SENDS_PER_SECOND workers.
+
     Args:
         bot: Telegram bot instance
         notifications_to_send: List of notifications [(type, race_id, race_data, label, history_key, [user_id]), ...]
+        now: UTC time captured at the start of this check cycle
     """
-    for notification_data in notifications_to_send:
+    if not notifications_to_send:
+        return
+
+    bundles = {}  # {user_id: [(notification_index, message, keyboard), ...]}
+    total_users = len(users_data)
+    # Custom reminders for the same race read the same this tick (the text shows
+    # the actual time left, not the slot) - render once per (race, GPRO language)
+    custom_rendered = {}
+
+    for idx, notification_data in enumerate(notifications_to_send):
         # Handle both formats: regular (5 items) and custom (6 items with user_id)
         if len(notification_data) == 6:
             notif_type, race_id, race_data, label, history_key, target_user_id = notification_data
@@ -285,41 +524,120 @@ async def _send_notifications_to_users(bot: Bot, notifications_to_send: list):
             target_user_id = None
             is_custom = False
 
-        logger.info(f"🔔 Sending {label} notification for race {race_id}")
-        sent_count = 0
-        total_users = len(users_data)
+        logger.info("🔔 Sending %s notification for race %d", label, race_id)
 
         # For custom notifications, send to specific user only
         if is_custom:
+            user_status = users_data.get(target_user_id)
+            if (user_status is None or target_user_id in blocked_users
+                    or user_status.get('completed_quali') == race_id):
+                continue
+            # Custom notifications are always quali-type
+            user_lang = user_status.get('gpro_lang', DEFAULT_USER_LANG)
+            variant = (race_id, user_lang)
+            if variant not in custom_rendered:
+                custom_rendered[variant] = render_quali_notification(
+                    race_id, race_data, label, user_lang, now=now, hours_left=race_data.get('hours_left')
+                )
+            bundles.setdefault(target_user_id, []).append((idx, *custom_rendered[variant]))
+            continue
+
+        # Regular notifications - send to all users with that notification enabled
+        # Quali reminders skip users who already marked this race done up front,
+        # so they never reach the sender at all
+        is_quali = notif_type == 'quali' or notif_type == 'opens'
+        # Opted-out and blocked users are removed with set differences on the
+        # user_id keys (done in C); statuses are then taken straight from
+        # users_data, so no per-user get_user_status() lookup happens
+        enabled_ids = users_data.keys() - get_disabled_users(label) - blocked_users
+        recipients = [
+            (user_id, users_data[user_id]) for user_id in enabled_ids
+            if not (is_quali and users_data[user_id].get('completed_quali') == race_id)
+        ]
+
+        # Messages only vary by GPRO language (quali) or by (group, language)
+        # (live/replay/results) - bucket recipients, then render once per bucket
+        buckets = defaultdict(list)
+        for user_id, user_status in recipients:
+            user_lang = user_status.get('gpro_lang', DEFAULT_USER_LANG)
+            group = None if is_quali else user_status.get('group')
+            buckets[(group, user_lang)].append(user_id)
+
+        for (group, user_lang), user_ids in buckets.items():
+            if is_quali:
+                entry = (idx, *render_quali_notification(race_id, race_data, label, user_lang, now=now,
+                                                         hours_left=race_data.get('hours_left')))
+            else:
+                entry = (idx, _GROUP_RENDERERS[notif_type](race_id, race_data, group, user_lang), None)
+            for user_id in user_ids:
+                bundles.setdefault(user_id, []).append(entry)
+
+    async def send_bundle(user_id: int, messages: list) -> list:
+        # Sequential per user keeps their messages in order; each send holds a
+        # broadcast slot for a second, which also spaces messages to one chat
+        delivered = []
+        for idx, message, keyboard in messages:
+            if await _send_rate_limited(send_rendered_notification(bot, user_id, message, keyboard)):
+                delivered.append(idx)
+        return delivered
+
+    sent_counts = [0] * len(notifications_to_send)
+    pending = iter(bundles.items())
+
+    async def send_worker():
+        # Workers share one iterator, so a broadcast only ever has as many
+        # tasks alive as there are send slots, however many users it reaches
+        for user_id, messages in pending:
             try:
-                # Custom notifications are always quali-type
-                await send_quali_notification(bot, target_user_id, race_id, race_data, label)
-                sent_count = 1
-                logger.info(f"✅ Sent custom notification ({label}) for race {race_id} to user {target_user_id}")
+                delivered = await send_bundle(user_id, messages)
             except Exception as e:
-                logger.error(f"Failed to send custom {label} to user {target_user_id}: {e}")
+                logger.error("Failed to send notifications to user %d: %s", user_id, e)
+                continue
+            for idx in delivered:
+                sent_counts[idx] += 1
+
+    # Send concurrently, bounded to stay under Telegram's global rate limit
+    worker_count = min(BROADCAST_MAX_SENDS_PER_SECOND, len(bundles))
+    await asyncio.gather(*[send_worker() for _ in range(worker_count)])
+
+    for idx, notification_data in enumerate(notifications_to_send):
+        race_id, label = notification_data[1], notification_data[3]
+        if len(notification_data) == 6:
+            if sent_counts[idx]:
+                logger.info("✅ Sent custom notification (%s) for race %d to user %d",
+                            label, race_id, notification_data[5])
         else:
-            # Regular notifications - send to all users with that notification enabled
-            for user_id in users_data:
-                if is_notification_enabled(user_id, label):
-                    try:
-                        if notif_type == 'quali' or notif_type == 'opens':
-                            await send_quali_notification(bot, user_id, race_id, race_data, label)
-                        elif notif_type == 'replay':
-                            await send_race_replay_notification(bot, user_id, race_id, race_data)
-                        elif notif_type == 'live':
-                            await send_race_live_notification(bot, user_id, race_id, race_data)
-                        elif notif_type == 'results':
-                            await send_race_results_notification(bot, user_id, race_id, race_data)
-                        sent_count += 1
-                    except Exception as e:
-                        logger.error(f"Failed to send {label} to user {user_id}: {e}")
-
-            logger.info(f"✅ Sent {label} for race {race_id} to {sent_count}/{total_users} users")
-
-        # Update history after sending (re-acquire lock briefly)
-        async with notification_lock:
-            notify_history[history_key] = datetime.utcnow()
+            logger.info("✅ Sent %s for race %d to %d/%d users",
+                        label, race_id, sent_counts[idx], total_users)
+
+    # Update history after sending (re-acquire lock briefly)
+    async with notification_lock:
+        for notification_data in notifications_to_send:
+            history_key = notification_data[4]
+            notify_history[history_key] = now
+            # Re-sent keys must move to the back to keep oldest-first order
+            notify_history.move_to_end(history_key)
+        await _save_notify_history()
+
+
+def _seconds_until_next_event(now: datetime, mono_now: float) -> Optional[float]:
+    """Seconds until the earliest indexed event window opens (None if nothing is scheduled)
+
+    While a quali-open poll is in progress, the next rate-limited API check
+    counts as an event too, so it runs on time rather than up to a tick late.
+    """
+    starts = [events[0][0] for events in (_closing_events, _opens_events, _live_events) if events]
+    seconds = (min(starts) - now).total_seconds() if starts else None
+    if _opens_active and last_api_check_mono is not None:
+        until_api_check = last_api_check_mono + API_CHECK_INTERVAL_MINUTES * 60 - mono_now
+        if until_api_check > 0 and (seconds is None or until_api_check < seconds):
+            seconds = until_api_check
+    return seconds
+
+
+def wake_notification_checker():
+    """Interrupt the checker's sleep so it re-checks right away (e.g. after a calendar update)"""
+    _wake_event.set()
 
 
 def _get_next_check_interval(now: datetime) -> int:
@@ -330,14 +648,15 @@ def _get_next_check_interval(now: datetime) -> int:
     Returns:
         int: Seconds until next check
     """
-    # Check if any race is approaching
-    for race_id, race_data in race_calendar.items():
-        race_time = race_data['date']
-        minutes_until_race = (race_time - now).total_seconds() / 60
+    # Binary search the sorted race starts for the first race that hasn't been
+    # over for longer than the live window
+    _ensure_event_indexes(now)
+    earliest = now - timedelta(minutes=RACE_LIVE_NOTIFICATION_AFTER_MINUTES)
+    idx = bisect.bisect_left(_race_starts, earliest)
 
-        # If race is within threshold, use fast checking
-        if -RACE_LIVE_NOTIFICATION_AFTER_MINUTES <= minutes_until_race <= RACE_PROXIMITY_THRESHOLD_MINUTES:
-            return CHECK_INTERVAL_FAST_SECONDS
+    # If that race is within threshold, use fast checking
+    if idx < len(_race_starts) and _race_starts[idx] <= now + timedelta(minutes=RACE_PROXIMITY_THRESHOLD_MINUTES):
+        return CHECK_INTERVAL_FAST_SECONDS
 
     # Default to normal interval
     return CHECK_INTERVAL_NORMAL_SECONDS
@@ -345,36 +664,90 @@ def _get_next_check_interval(now: datetime) -> int:
 
 async def check_notifications(bot: Bot):
     """Continuous notification loop - adaptive check interval based on race proximity"""
-    global notify_history
     logger.info(f"🔔 Starting notification checker (adaptive: {CHECK_INTERVAL_NORMAL_SECONDS//60}min normal, {CHECK_INTERVAL_FAST_SECONDS}s when race approaching)")
-    load_users_data()
+    _load_notify_history()
+
+    loop = asyncio.get_running_loop()
 
     while True:
+        # Anchor the tick on the monotonic loop clock, so time spent checking and
+        # sending does not push every following check later
+        tick_start = loop.time()
         try:
             # Determine what notifications to send (quick check under lock)
             async with notification_lock:
+                # Read the clocks once - every check, render and history entry
+                # of this tick agrees on the same moment
                 now = datetime.utcnow()
+                mono_now = time.monotonic()
 
                 # Check all notification types
                 notifications_to_send = []
-                notifications_to_send.extend(_check_quali_closing_notifications(now))
-                notifications_to_send.extend(await _check_quali_open_notifications(now))
-                notifications_to_send.extend(_check_race_live_notifications(now))
-                notifications_to_send.extend(_check_custom_notifications(now))
+                if users_data:
+                    notifications_to_send.extend(_check_quali_closing_notifications(now))
+                    notifications_to_send.extend(await _check_quali_open_notifications(now, mono_now))
+                    notifications_to_send.extend(_check_race_live_notifications(now))
+                    notifications_to_send.extend(_check_custom_notifications(now))
+                else:
+                    # Nothing is recorded in notify_history, so users who join
+                    # mid-window still get the notification on a later tick
+                    logger.debug("No subscribers, skipping notification checks")
 
                 # Clean old history entries
                 cutoff = now - timedelta(days=NOTIFICATION_HISTORY_RETENTION_DAYS)
-                notify_history = {k: v for k, v in notify_history.items() if v > cutoff}
+                _prune_notify_history(cutoff)
 
-                # Determine next check interval based on race proximity
+                # Determine next check interval based on race proximity, but wake
+                # up early if an event window opens before then. The interval stays
+                # the upper bound - custom notifications are still checked by polling
                 next_interval = _get_next_check_interval(now)
+                if users_data:
+                    until_event = _seconds_until_next_event(now, mono_now)
+                    if until_event is not None:
+                        next_interval = max(1, min(next_interval, until_event))
 
             # Send notifications outside the lock (slow operation)
-            await _send_notifications_to_users(bot, notifications_to_send)
+            await _send_notifications_to_users(bot, notifications_to_send, now)
 
         except Exception as e:
             logger.error(f"❌ Notification check error: {e}")
             next_interval = CHECK_INTERVAL_NORMAL_SECONDS  # Fallback on error
 
-        # Wait before next check (adaptive interval)
-        await asyncio.sleep(next_interval)
+        # Wait until the next check is due (adaptive interval, absolute deadline)
+        # or until something calls wake_notification_checker()
+        try:
+            await asyncio.wait_for(_wake_event.wait(), max(0, tick_start + next_interval - loop.time()))
+        except asyncio.TimeoutError:
+            pass
+        _wake_event.clear()
+
+
+def start_notification_checker(bot: Bot) -> asyncio.Task:
+    """Launch the notification loop as a background task
+
+    Only one loop may run per process - if a checker task is already running,
+    it is returned instead of starting a duplicate.
+
+    Returns:
+        asyncio.Task: The running notification checker task
+    """
+    global _checker_task
+    if _checker_task is not None and not _checker_task.done():
+        logger.warning("Notification checker already running, not starting another")
+        return _checker_task
+
+    _checker_task = asyncio.create_task(check_notifications(bot))
+    return _checker_task
+
+
+async def stop_notification_checker():
+    """Cancel the notification loop and wait for it to finish (no-op if not running)"""
+    global _checker_task
+    task, _checker_task = _checker_task, None
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
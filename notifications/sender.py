@@ -1,17 +1,61 @@
 """Functions for sending notifications to users"""
+import asyncio
 import logging
 import re
+from functools import lru_cache
 from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+from aiogram_i18n import I18nContext
 from datetime import datetime
-from typing import Dict
+from typing import Dict, Optional, Set, Tuple
 
 from gpro_calendar import race_calendar
 from utils import add_flag_to_track
-from .user_data import get_user_status, DEFAULT_USER_LANG
+from .user_data import get_user_status, is_valid_language, DEFAULT_USER_LANG, LANGUAGE_OPTIONS
 
 logger = logging.getLogger(__name__)
 
+# GPRO URL endpoints
+GPRO_LIVE_ENDPOINT = "racescreenlive.asp"
+GPRO_REPLAY_ENDPOINT = "racescreen.asp"
+GPRO_SUMMARY_ENDPOINT = "RaceSummary.asp"
+_LINK_ENDPOINTS = {
+    'live': GPRO_LIVE_ENDPOINT,
+    'replay': GPRO_REPLAY_ENDPOINT,
+    'summary': GPRO_SUMMARY_ENDPOINT
+}
+_BASE_URL_TMPL = "https://gpro.net/{lang}/{endpoint}?Group="
+# Base URLs pre-built for every supported language: {(lang, link_type): url}
+_BASE_URLS = {
+    (lang, link_type): _BASE_URL_TMPL.format(lang=lang, endpoint=endpoint)
+    for lang in LANGUAGE_OPTIONS
+    for link_type, endpoint in _LINK_ENDPOINTS.items()
+}
+
+# Group code format (e.g., M3, R11, P15, A42) and the names GPRO uses in URLs
+_GROUP_RE = re.compile(r'^([MPAR])(\d{1,3})$')
+_GROUP_NAMES = {
+    'M': 'Master',
+    'P': 'Pro',
+    'A': 'Amateur',
+    'R': 'Rookie'
+}
+
+# Users who blocked the bot - skipped by broadcasts until they /start again
+blocked_users: Set[int] = set()
+
+# Loop time until which all sends hold off after Telegram flood control kicks in
+_flood_control_until = 0.0
+# Sends per message before giving up under repeated flood control
+SEND_MAX_ATTEMPTS = 3
+
+
+@lru_cache(maxsize=128)
+def _format_utc(dt: datetime) -> str:
+    """Format race/deadline time for messages (cached - identical for every user in a broadcast)"""
+    return dt.strftime('%d.%m %H:%M UTC')
+
 
 def generate_gpro_link(group: str, lang: str = 'gb', link_type: str = 'live') -> str:
     """Generate GPRO race link based on group format and type
@@ -19,51 +63,55 @@ def generate_gpro_link(group: str, lang: str = 'gb', link_type: str = 'live') ->
     Args:
         group: User's GPRO group (E, M3, R11, etc.)
         lang: Language code for URL (e.g., 'gb', 'de', 'fr')
-        link_type: 'live' for live race, 'replay' for replay
+        link_type: 'live' for live race, 'replay' for replay, 'summary' for race summary
 
     Examples: E → Elite, M3 → Master - 3, A42 → Amateur - 42, R11 → Rookie - 11"""
-    from .user_data import is_valid_language
+    if (lang, link_type) not in _BASE_URLS:
+        # Validate and fallback for language - outside the cache, so every
+        # bad code is reported and none of them take up cache slots
+        if not is_valid_language(lang):
+            logger.warning(f"Invalid language code '{lang}', falling back to 'gb'")
+            lang = 'gb'
+        # Unknown link types get the replay endpoint
+        if link_type not in _LINK_ENDPOINTS:
+            link_type = 'replay'
+    return _gpro_link(group, lang, link_type)
+
+
+@lru_cache(maxsize=2048)
+def _gpro_link(group: str, lang: str, link_type: str) -> str:
+    """generate_gpro_link for an already validated (lang, link_type)
+
+    Cached - a broadcast only produces a few dozen distinct (group, lang, type) links.
+    """
+    base_url = _BASE_URLS[(lang, link_type)]
+    if not group:
+        return base_url
 
-    # GPRO URL endpoints
-    GPRO_LIVE_ENDPOINT = "racescreenlive.asp"
-    GPRO_REPLAY_ENDPOINT = "racescreen.asp"
+    return base_url + _group_query_value(group)
 
-    # Validate and fallback for language
-    if not is_valid_language(lang):
-        logger.warning(f"Invalid language code '{lang}', falling back to 'gb'")
-        lang = 'gb'
 
-    # Determine endpoint based on link type
-    endpoint = GPRO_LIVE_ENDPOINT if link_type == 'live' else GPRO_REPLAY_ENDPOINT
-    base_url = f"https://gpro.net/{lang}/{endpoint}?Group="
-
-    if not group:
-        return base_url
+@lru_cache(maxsize=512)
+def _group_query_value(group: str) -> str:
+    """URL-encoded Group= value for a user's group ('' if the format is invalid)
 
+    Cached - a broadcast only ever sees a handful of distinct groups.
+    """
     group = group.strip().upper()
 
     # Elite has no number
     if group == 'E':
-        return f"{base_url}Elite"
+        return "Elite"
 
     # Parse group letter and number (e.g., M3, R11, P15, A42)
-    match = re.match(r'^([MPAR])(\d{1,3})$', group)
+    match = _GROUP_RE.match(group)
     if not match:
         # Invalid format, return default
-        return base_url
+        return ""
 
     letter, number = match.groups()
-    group_names = {
-        'M': 'Master',
-        'P': 'Pro',
-        'A': 'Amateur',
-        'R': 'Rookie'
-    }
-
-    group_name = group_names[letter]
     # URL encode: "Rookie - 11" → "Rookie%20-%2011"
-    encoded = f"{group_name}%20-%20{number}"
-    return f"{base_url}{encoded}"
+    return f"{_GROUP_NAMES[letter]}%20-%20{number}"
 
 
 def generate_race_link(group: str, lang: str = 'gb') -> str:
@@ -76,6 +124,21 @@ def generate_replay_link(group: str, lang: str = 'gb') -> str:
     return generate_gpro_link(group, lang, 'replay')
 
 
+def _untranslated(key: str, **kwargs) -> str:
+    """Fallback lookup when no i18n context exists - returns the key itself"""
+    return key
+
+
+def _text_getter(i18n=None):
+    """Return the key -> text lookup for i18n (or the current context if omitted)"""
+    if i18n is None:
+        try:
+            i18n = I18nContext.get_current(no_error=True)
+        except:
+            i18n = None
+    return i18n.get if i18n else _untranslated
+
+
 def format_weather_data(weather: dict, i18n=None) -> str:
     """Format weather data into human-readable text
 
@@ -86,19 +149,7 @@ def format_weather_data(weather: dict, i18n=None) -> str:
     Returns:
         str: Formatted weather message
     """
-    # Import i18n context if not provided
-    if i18n is None:
-        from aiogram_i18n import I18nContext
-        try:
-            i18n = I18nContext.get_current(no_error=True)
-        except:
-            i18n = None
-
-    # Use i18n if available, fallback to English
-    def get_text(key, **kwargs):
-        if i18n:
-            return i18n.get(key, **kwargs)
-        return key
+    get_text = _text_getter(i18n)
 
     if not weather:
         return get_text("weather-unavailable")
@@ -149,138 +200,66 @@ def format_weather_data(weather: dict, i18n=None) -> str:
     return message
 
 
-async def send_race_live_notification(bot: Bot, user_id: int, race_id: int, race_data: Dict, i18n=None):
-    """Send notification when race goes live"""
-    user_status = get_user_status(user_id)
-    group = user_status.get('group')
-    user_lang = user_status.get('gpro_lang', DEFAULT_USER_LANG)
+def render_race_live_notification(race_id: int, race_data: Dict, group: Optional[str],
+                                  user_lang: str = DEFAULT_USER_LANG, i18n=None) -> str:
+    """Build race live message text
 
+    Depends only on the race, group and GPRO language, so broadcasts render
+    it once per (group, language) and reuse it for every matching user.
+    """
     track = add_flag_to_track(race_data['track'])
     race_date = race_data['date']
-    race_time = race_date.strftime('%d.%m %H:%M UTC')
+    race_time = _format_utc(race_date)
 
     race_link = generate_race_link(group, user_lang)
 
-    # Import i18n context if not provided
-    if i18n is None:
-        from aiogram_i18n import I18nContext
-        try:
-            i18n = I18nContext.get_current(no_error=True)
-        except:
-            i18n = None
-
-    # Use i18n if available, fallback to English
-    def get_text(key, **kwargs):
-        if i18n:
-            return i18n.get(key, **kwargs)
-        return key
-
-    # Build message based on whether group is set
-    if group:
-        message = get_text(
-            "notif-race-live",
-            raceId=race_id,
-            track=track,
-            raceTime=race_time,
-            raceLink=race_link
-        )
-    else:
-        message = get_text(
-            "notif-race-live-no-group",
-            raceId=race_id,
-            track=track,
-            raceTime=race_time,
-            raceLink=race_link
-        )
-
-    try:
-        await bot.send_message(user_id, message, parse_mode='Markdown')
-        logger.info(f"🏁 Sent race live notification to {user_id} for race {race_id}")
-    except Exception as e:
-        logger.error(f"Race live notify {user_id} failed: {e}")
+    get_text = _text_getter(i18n)
 
+    # Only the message key depends on whether group is set
+    return get_text(
+        "notif-race-live" if group else "notif-race-live-no-group",
+        raceId=race_id,
+        track=track,
+        raceTime=race_time,
+        raceLink=race_link
+    )
 
-async def send_race_replay_notification(bot: Bot, user_id: int, race_id: int, race_data: Dict, i18n=None):
-    """Send race replay notification when next quali opens"""
-    user_status = get_user_status(user_id)
-    group = user_status.get('group')
-    user_lang = user_status.get('gpro_lang', DEFAULT_USER_LANG)
 
+def render_race_replay_notification(race_id: int, race_data: Dict, group: Optional[str],
+                                    user_lang: str = DEFAULT_USER_LANG, i18n=None) -> str:
+    """Build race replay message text (per race, group and GPRO language)"""
     track = add_flag_to_track(race_data['track'])
     race_date = race_data['date']
-    race_time = race_date.strftime('%d.%m %H:%M UTC')
+    race_time = _format_utc(race_date)
 
     replay_link = generate_replay_link(group, user_lang)
 
-    # Import i18n context if not provided
-    if i18n is None:
-        from aiogram_i18n import I18nContext
-        try:
-            i18n = I18nContext.get_current(no_error=True)
-        except:
-            i18n = None
+    get_text = _text_getter(i18n)
 
-    # Use i18n if available, fallback to English
-    def get_text(key, **kwargs):
-        if i18n:
-            return i18n.get(key, **kwargs)
-        return key
+    # Only the message key depends on whether group is set
+    return get_text(
+        "notif-race-replay" if group else "notif-race-replay-no-group",
+        raceId=race_id,
+        track=track,
+        raceTime=race_time,
+        replayLink=replay_link
+    )
 
-    # Build message based on whether group is set
-    if group:
-        message = get_text(
-            "notif-race-replay",
-            raceId=race_id,
-            track=track,
-            raceTime=race_time,
-            replayLink=replay_link
-        )
-    else:
-        message = get_text(
-            "notif-race-replay-no-group",
-            raceId=race_id,
-            track=track,
-            raceTime=race_time,
-            replayLink=replay_link
-        )
-
-    try:
-        await bot.send_message(user_id, message, parse_mode='Markdown')
-        logger.info(f"📺 Sent race replay notification to {user_id} for race {race_id}")
-    except Exception as e:
-        logger.error(f"Race replay notify {user_id} failed: {e}")
-
-
-async def send_race_results_notification(bot: Bot, user_id: int, race_id: int, race_data: Dict, i18n=None):
-    """Send race results notification when next quali opens"""
-    user_status = get_user_status(user_id)
-    group = user_status.get('group')
-    user_lang = user_status.get('gpro_lang', DEFAULT_USER_LANG)
 
+def render_race_results_notification(race_id: int, race_data: Dict, group: Optional[str],
+                                     user_lang: str = DEFAULT_USER_LANG, i18n=None) -> str:
+    """Build race results message text (per race, group and GPRO language)"""
     track = add_flag_to_track(race_data['track'])
     race_date = race_data['date']
-    race_time = race_date.strftime('%d.%m %H:%M UTC')
+    race_time = _format_utc(race_date)
 
     # Race Analysis link (same for everyone, just language)
     analysis_link = f"https://gpro.net/{user_lang}/RaceAnalysis.asp"
 
-    # Race Summary link (group-dependent)
-    summary_link = generate_gpro_link(group, user_lang, 'replay')  # Use same format as replay
-    summary_link = summary_link.replace('racescreen.asp', 'RaceSummary.asp')
+    # Race Summary link (group-dependent, same format as replay)
+    summary_link = generate_gpro_link(group, user_lang, 'summary')
 
-    # Import i18n context if not provided
-    if i18n is None:
-        from aiogram_i18n import I18nContext
-        try:
-            i18n = I18nContext.get_current(no_error=True)
-        except:
-            i18n = None
-
-    # Use i18n if available, fallback to English
-    def get_text(key, **kwargs):
-        if i18n:
-            return i18n.get(key, **kwargs)
-        return key
+    get_text = _text_getter(i18n)
 
     # Build message based on whether group is set
     if group:
@@ -301,54 +280,61 @@ async def send_race_results_notification(bot: Bot, user_id: int, race_id: int, r
             analysisLink=analysis_link
         )
 
-    try:
-        await bot.send_message(user_id, message, parse_mode='Markdown')
-        logger.info(f"📊 Sent race results notification to {user_id} for race {race_id}")
-    except Exception as e:
-        logger.error(f"Race results notify {user_id} failed: {e}")
+    return message
 
 
-async def send_quali_notification(bot: Bot, user_id: int, race_id: int, race_data: Dict, notification_type: str = "deadline", i18n=None):
-    user_status = get_user_status(user_id)
+@lru_cache(maxsize=256)
+def _quali_keyboard(race_id: int, is_marked_done: bool, action_text: str,
+                    weather_text: Optional[str] = None) -> InlineKeyboardMarkup:
+    """Build (and cache) the Done/Re-enable + optional Weather keyboard for a race
 
-    # Skip automatic notifications if user marked quali done
-    if user_status.get('completed_quali') == race_id and notification_type != "manual":
-        return
+    Keyboards are only read by send_message, so one instance is shared by all users.
+    """
+    action = "reset" if is_marked_done else "done"
+    keyboard_buttons = [
+        [InlineKeyboardButton(text=action_text, callback_data=f"{action}_{race_id}")]
+    ]
+    if weather_text:
+        keyboard_buttons.append([InlineKeyboardButton(text=weather_text, callback_data=f"weather_{race_id}")])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
+
+
+def render_quali_notification(race_id: int, race_data: Dict, notification_type: str = "deadline",
+                              user_lang: str = DEFAULT_USER_LANG, is_marked_done: bool = False,
+                              i18n=None, now: Optional[datetime] = None,
+                              hours_left: Optional[float] = None) -> Tuple[str, InlineKeyboardMarkup]:
+    """Build quali notification text and keyboard
 
+    The result depends only on the race, notification type, GPRO language and
+    done-state - not on the user - so broadcasts render it once and reuse it.
+
+    Args:
+        now: Current UTC time captured by the caller (read from the clock if omitted)
+        hours_left: Hours until quali closes, if the caller already computed it
+            (otherwise derived from now)
+
+    Returns:
+        (message, keyboard)
+    """
     track = add_flag_to_track(race_data['track'])
-    race_date = race_data['date']
     quali_close = race_data['quali_close']
-    user_lang = user_status.get('gpro_lang', DEFAULT_USER_LANG)
+    # Same display strings for every notification type (cached per datetime)
+    deadline = _format_utc(quali_close)
+    race_time = _format_utc(race_data['date'])
 
     # Generate qualifying link
     quali_link = f"https://gpro.net/{user_lang}/Qualify.asp"
 
-    # Import i18n context if not provided
-    if i18n is None:
-        from aiogram_i18n import I18nContext
-        try:
-            i18n = I18nContext.get_current(no_error=True)
-        except:
-            i18n = None
-
-    # Use i18n if available, fallback to English
-    def get_text(key, **kwargs):
-        if i18n:
-            return i18n.get(key, **kwargs)
-        # Fallback to English (shouldn't happen, but safety)
-        return key
+    get_text = _text_getter(i18n)
 
     if notification_type == "opens_soon":
         emoji = "🆕"
         title = get_text("notif-quali-opens")
-        deadline = quali_close.strftime("%d.%m %H:%M UTC")
-        race_time = race_date.strftime('%d.%m %H:%M UTC')
     else:
-        now = datetime.utcnow()
-        if 'hours_left' not in race_data:
+        if hours_left is None:
+            if now is None:
+                now = datetime.utcnow()
             hours_left = (quali_close - now).total_seconds() / 3600
-        else:
-            hours_left = race_data['hours_left']
 
         if hours_left >= 24:
             hours = int(hours_left)
@@ -366,55 +352,85 @@ async def send_quali_notification(bot: Bot, user_id: int, race_id: int, race_dat
             time_text = get_text("time-minutes", minutes=minutes)
             emoji = "🚨"
 
-        deadline = quali_close.strftime("%d.%m %H:%M UTC")
-        race_time = race_date.strftime('%d.%m %H:%M UTC')
         title = get_text("notif-quali-closes", time=time_text)
 
-    # Check if user already marked this race done
-    is_marked_done = user_status.get('completed_quali') == race_id
-
     # Check if weather data is available
     has_weather = race_id in race_calendar and 'weather' in race_calendar[race_id]
 
-    if is_marked_done:
-        keyboard_buttons = [
-            [InlineKeyboardButton(text=get_text("button-reenable-race", raceId=race_id), callback_data=f"reset_{race_id}")]
-        ]
-        if has_weather:
-            keyboard_buttons.append([InlineKeyboardButton(text=get_text("button-weather"), callback_data=f"weather_{race_id}")])
+    weather_text = get_text("button-weather") if has_weather else None
 
-        keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
-        message = get_text(
-            "notif-quali-message-disabled",
-            emoji=emoji,
-            title=title,
-            raceId=race_id,
-            track=track,
-            qualiDeadline=deadline,
-            raceTime=race_time,
-            qualiLink=quali_link
-        )
+    if is_marked_done:
+        keyboard = _quali_keyboard(race_id, True, get_text("button-reenable-race", raceId=race_id), weather_text)
     else:
-        keyboard_buttons = [
-            [InlineKeyboardButton(text=get_text("button-quali-done"), callback_data=f"done_{race_id}")]
-        ]
-        if has_weather:
-            keyboard_buttons.append([InlineKeyboardButton(text=get_text("button-weather"), callback_data=f"weather_{race_id}")])
-
-        keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
-        message = get_text(
-            "notif-quali-message",
-            emoji=emoji,
-            title=title,
-            raceId=race_id,
-            track=track,
-            qualiDeadline=deadline,
-            raceTime=race_time,
-            qualiLink=quali_link
-        )
+        keyboard = _quali_keyboard(race_id, False, get_text("button-quali-done"), weather_text)
+    message = get_text(
+        "notif-quali-message-disabled" if is_marked_done else "notif-quali-message",
+        emoji=emoji,
+        title=title,
+        raceId=race_id,
+        track=track,
+        qualiDeadline=deadline,
+        raceTime=race_time,
+        qualiLink=quali_link
+    )
+
+    return message, keyboard
+
+
+async def send_rendered_notification(bot: Bot, user_id: int, message: str, keyboard: InlineKeyboardMarkup = None) -> bool:
+    """Send a pre-rendered notification to a single user
+
+    Honors Telegram flood control: on RetryAfter, waits the server-provided
+    delay and retries, up to SEND_MAX_ATTEMPTS sends in total. The delay is
+    shared, so every concurrent send in a broadcast pauses too instead of
+    hitting the limit again. Users who blocked the bot are added to
+    blocked_users so broadcasts stop targeting them.
 
+    Returns:
+        bool: True if the message was delivered
+    """
+    global _flood_control_until
+    loop = asyncio.get_running_loop()
     try:
-        await bot.send_message(user_id, message, reply_markup=keyboard, parse_mode='Markdown')
-        logger.info(f"✅ Sent {notification_type} to {user_id} for race {race_id}")
+        for attempt in range(1, SEND_MAX_ATTEMPTS + 1):
+            delay = _flood_control_until - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                await bot.send_message(user_id, message, reply_markup=keyboard, parse_mode='Markdown')
+                return True
+            except TelegramRetryAfter as e:
+                if attempt == SEND_MAX_ATTEMPTS:
+                    raise
+                logger.warning("Flood control for %d, retrying in %ss", user_id, e.retry_after)
+                _flood_control_until = max(_flood_control_until, loop.time() + e.retry_after)
+    except TelegramForbiddenError:
+        blocked_users.add(user_id)
+        logger.info("User %d blocked the bot, skipping future broadcasts", user_id)
+        return False
     except Exception as e:
-        logger.error(f"Notify {user_id} failed: {e}")
+        logger.error("Notify %d failed: %s", user_id, e)
+        return False
+
+
+async def send_quali_notification(bot: Bot, user_id: int, race_id: int, race_data: Dict, notification_type: str = "deadline", i18n=None,
+                                  now: Optional[datetime] = None, user_status: Optional[Dict] = None,
+                                  hours_left: Optional[float] = None):
+    if user_status is None:
+        user_status = get_user_status(user_id)
+
+    # Skip automatic notifications if user marked quali done
+    if user_status.get('completed_quali') == race_id and notification_type != "manual":
+        return
+
+    user_lang = user_status.get('gpro_lang', DEFAULT_USER_LANG)
+
+    # Check if user already marked this race done
+    is_marked_done = user_status.get('completed_quali') == race_id
+
+    message, keyboard = render_quali_notification(
+        race_id, race_data, notification_type, user_lang, is_marked_done, i18n, now, hours_left
+    )
+
+    if await send_rendered_notification(bot, user_id, message, keyboard):
+        logger.info("✅ Sent %s to %d for race %d", notification_type, user_id, race_id)
@@ -1,8 +1,16 @@
 """User data persistence and management"""
+import asyncio
+import atexit
+import bisect
+import hashlib
 import logging
-import json
+import mmap
 import os
-from typing import Dict
+import sys
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import DURABLE_SAVE
+from utils import json_dumps, json_loads, fsync_dir, orjson
 
 logger = logging.getLogger(__name__)
 
@@ -22,25 +30,93 @@ LANGUAGE_OPTIONS = {
     'be': '🇧🇪 Vlaams', 'br': '🇧🇷 Português (BR)', 'cz': '🇨🇿 Čeština',
     'sk': '🇸🇰 Slovenčina'
 }
+# Codes only, for validation (LANGUAGE_OPTIONS is a mutable display table)
+_VALID_LANG_CODES = frozenset(LANGUAGE_OPTIONS)
 DEFAULT_USER_LANG = 'gb'
 
 # Use absolute path based on script location for robustness
 _SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 USERS_FILE = os.path.join(_SCRIPT_DIR, 'users_data.json')
+# Append-only log of per-user changes, folded into USERS_FILE on compaction
+USERS_WAL_FILE = os.path.join(_SCRIPT_DIR, 'users_data.wal')
+WAL_COMPACT_INTERVAL_SECONDS = 300  # Coalesce WAL records for up to 5 minutes before compacting
+
+WAL_FLUSH_DELAY_SECONDS = 0.2  # Batch WAL appends from a burst of mutations into one write
+
+_wal_file = None  # Lazily opened append handle for USERS_WAL_FILE
+_wal_buffer = bytearray()  # Records appended but not yet written to USERS_WAL_FILE
+_wal_flush_handle: Optional[asyncio.TimerHandle] = None  # Scheduled _flush_wal() call
+_wal_records = 0  # Records appended since last compaction
+_loaded = False  # Set once load_users_data() has run
+_dirty_event = asyncio.Event()  # Set by save_user(), wakes the compaction task
+_snapshot_digest: Optional[bytes] = None  # Hash of the snapshot currently on disk (loaded or written)
+_compactor_task: Optional[asyncio.Task] = None  # Running compaction loop (one per process)
+_compaction_save: Optional[asyncio.Future] = None  # Snapshot save started by the compaction loop
+
+# {notification_type: {user_id, ...}} - users who turned that type OFF.
+# Most users keep the defaults, so these stay small and broadcasts can filter
+# recipients with one set lookup instead of two nested dict lookups per user.
+_disabled_notifications: Dict[str, Set[int]] = {}
+# {user_id: ((slot_idx, hours_before), ...)} - only users with an enabled custom
+# reminder, so the per-tick custom check skips everyone else
+_custom_notification_slots: Dict[int, Tuple[Tuple[int, float], ...]] = {}
+# Same slots flattened and sorted by hours_before, rebuilt lazily after a change,
+# so a race's tolerance window is answered with a bisect instead of a full scan
+_custom_slots_by_hours: List[Tuple[float, int, int]] = []  # (hours_before, user_id, slot_idx)
+_custom_slot_hours: List[float] = []  # hours_before column of the above, for bisect
+_custom_slots_stale = True
+
+
+def _digest(data) -> bytes:
+    """Short content hash used to detect unchanged snapshots"""
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _load_json_file(f) -> Tuple[object, bytes]:
+    """Parse an open binary JSON file
+
+    With orjson the file is memory-mapped and parsed in place, so no bytes
+    copy of the whole file is held next to the parsed objects.
+
+    Returns:
+        tuple: (parsed data, digest of the file contents)
+    """
+    if orjson is not None and os.fstat(f.fileno()).st_size:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            return orjson.loads(view), _digest(view)
+    raw = f.read()
+    return json_loads(raw), _digest(raw)
+
+
+# Preset notification types and their bit in a user's 'notif_mask' - one int
+# per user instead of a dict of booleans (bit set = enabled)
+NOTIFICATION_BITS = {
+    '48h': 1 << 0,
+    '24h': 1 << 1,
+    '2h': 1 << 2,
+    '10min': 1 << 3,
+    'opens_soon': 1 << 4,
+    'race_replay': 1 << 5,
+    'race_live': 1 << 6,
+    'race_results': 1 << 7
+}
+# Default notification settings - all enabled by default
+ALL_NOTIFICATIONS_MASK = (1 << len(NOTIFICATION_BITS)) - 1
 
 
-def get_default_notification_preferences():
-    """Default notification settings - all enabled by default"""
-    return {
-        '48h': True,
-        '24h': True,
-        '2h': True,
-        '10min': True,
-        'opens_soon': True,
-        'race_replay': True,
-        'race_live': True,
-        'race_results': True
-    }
+def get_notification_preferences(user_status: Dict) -> Dict[str, bool]:
+    """{notification_type: enabled} decoded from a user's notif_mask"""
+    mask = user_status.get('notif_mask', ALL_NOTIFICATIONS_MASK)
+    return {notification_type: bool(mask & bit) for notification_type, bit in NOTIFICATION_BITS.items()}
+
+
+def _preferences_to_mask(preferences: Dict) -> int:
+    """Encode a legacy {notification_type: enabled} dict (missing types count as enabled)"""
+    mask = 0
+    for notification_type, bit in NOTIFICATION_BITS.items():
+        if preferences.get(notification_type, True):
+            mask |= bit
+    return mask
 
 
 def get_default_custom_notifications():
@@ -51,124 +127,496 @@ def get_default_custom_notifications():
     ]
 
 
+def _intern_user_strings(status: Dict) -> Dict:
+    """Share string values that repeat across users (languages, group names)
+
+    JSON parsing allocates a fresh str for every value, so thousands of users
+    would otherwise each hold their own copy of 'gb', 'en', 'Amateur - 12', ...
+    """
+    for field in ('group', 'gpro_lang', 'ui_lang'):
+        value = status.get(field)
+        if isinstance(value, str):
+            status[field] = sys.intern(value)
+    return status
+
+
+def _index_notification_preferences(user_id: int, user_status: Dict):
+    """Sync _disabled_notifications with one user's notification preferences"""
+    mask = user_status.get('notif_mask', ALL_NOTIFICATIONS_MASK)
+    for notification_type, bit in NOTIFICATION_BITS.items():
+        disabled = _disabled_notifications.setdefault(notification_type, set())
+        if mask & bit:
+            disabled.discard(user_id)
+        else:
+            disabled.add(user_id)
+
+
+def get_disabled_users(notification_type: str) -> Set[int]:
+    """IDs of users who disabled a notification type (do not mutate)"""
+    return _disabled_notifications.get(notification_type, set())
+
+
+def _index_custom_notifications(user_id: int, user_status: Dict):
+    """Sync _custom_notification_slots with one user's custom reminders"""
+    global _custom_slots_stale
+    _custom_slots_stale = True
+    slots = tuple(
+        (slot_idx, custom_notif['hours_before'])
+        for slot_idx, custom_notif in enumerate(user_status.get('custom_notifications', ()))
+        if custom_notif.get('enabled', False) and custom_notif.get('hours_before') is not None
+    )
+    if slots:
+        _custom_notification_slots[user_id] = slots
+    else:
+        _custom_notification_slots.pop(user_id, None)
+
+
+def get_custom_notifications_between(min_hours: float, max_hours: float) -> List[Tuple[float, int, int]]:
+    """Enabled custom reminders with min_hours <= hours_before <= max_hours
+
+    Returns:
+        list: [(hours_before, user_id, slot_idx), ...] sorted by hours_before
+    """
+    global _custom_slots_by_hours, _custom_slot_hours, _custom_slots_stale
+    if _custom_slots_stale:
+        _custom_slots_by_hours = sorted(
+            (hours_before, user_id, slot_idx)
+            for user_id, slots in _custom_notification_slots.items()
+            for slot_idx, hours_before in slots
+        )
+        _custom_slot_hours = [entry[0] for entry in _custom_slots_by_hours]
+        _custom_slots_stale = False
+    start = bisect.bisect_left(_custom_slot_hours, min_hours)
+    end = bisect.bisect_right(_custom_slot_hours, max_hours, start)
+    return _custom_slots_by_hours[start:end]
+
+
+def _migrate_user_record(user_status: Dict) -> bool:
+    """Add fields missing from records written by older versions
+
+    Returns:
+        bool: True if the record was changed
+    """
+    changed = False
+    if 'group' not in user_status:
+        user_status['group'] = None
+        changed = True
+    if 'notif_mask' not in user_status:
+        # Older records kept a dict of booleans under 'notifications'
+        user_status['notif_mask'] = _preferences_to_mask(user_status.pop('notifications', {}))
+        changed = True
+    if 'custom_notifications' not in user_status:
+        user_status['custom_notifications'] = get_default_custom_notifications()
+        changed = True
+    if 'gpro_lang' not in user_status:
+        user_status['gpro_lang'] = DEFAULT_USER_LANG
+        changed = True
+    if 'ui_lang' not in user_status:
+        user_status['ui_lang'] = 'en'
+        changed = True
+    return changed
+
+
 def load_users_data():
-    global users_data
+    """Load snapshot from USERS_FILE, then replay the WAL on top of it
+
+    Runs at most once per process - later calls are no-ops.
+    """
+    global users_data, _wal_records, _loaded, _snapshot_digest
+    if _loaded:
+        return
+    _loaded = True
     if os.path.exists(USERS_FILE):
         try:
-            with open(USERS_FILE, 'r') as f:
-                raw_data = json.load(f)
-                # TYPE FIX: Convert string keys → int keys
-                clean_data = {int(k_str): status for k_str, status in raw_data.items()}
-                users_data.update(clean_data)
-                logger.info(f"✅ Loaded {len(users_data)} users (int keys)")
+            with open(USERS_FILE, 'rb') as f:
+                # Seeding the digest lets the first compaction after a restart
+                # skip the write when replayed/migrated data ends up identical
+                raw_data, _snapshot_digest = _load_json_file(f)
+            # TYPE FIX: Convert string keys → int keys (JSON object keys are always strings).
+            # Fed straight into users_data - no intermediate dict of all users
+            users_data.update((int(k_str), _intern_user_strings(status)) for k_str, status in raw_data.items())
+            del raw_data
+            logger.info(f"✅ Loaded {len(users_data)} users (int keys)")
         except Exception as e:
             logger.error(f"Load failed: {e}")
 
+    if os.path.exists(USERS_WAL_FILE):
+        replayed = 0
+        try:
+            with open(USERS_WAL_FILE, 'rb') as f:
+                for line in f:
+                    try:
+                        record = json_loads(line)
+                    except ValueError:
+                        # Torn write from a crash - skip it
+                        logger.warning("Skipping corrupt WAL record")
+                        continue
+                    # Last writer wins
+                    users_data[record['uid']] = _intern_user_strings(record['status'])
+                    replayed += 1
+            _wal_records = replayed
+            if replayed:
+                logger.info(f"✅ Replayed {replayed} WAL records")
+        except Exception as e:
+            logger.error(f"WAL replay failed: {e}")
+
+    # Single pass: bring legacy records up to the current schema and build indexes
+    migrated = 0
+    for user_id, user_status in users_data.items():
+        if _migrate_user_record(user_status):
+            migrated += 1
+        _index_notification_preferences(user_id, user_status)
+        _index_custom_notifications(user_id, user_status)
+
+    if migrated:
+        logger.info(f"✅ Migrated {migrated} user records")
+        save_users_data()
 
-def save_users_data():
-    """Save user data with atomic write to prevent corruption"""
+
+def save_user(user_id: int):
+    """Persist a single user's record by appending it to the WAL
+
+    O(1) per mutation - the full snapshot is only rewritten on compaction.
+    On the event loop, records are buffered and written together
+    WAL_FLUSH_DELAY_SECONDS after the first one, so a burst costs one write.
+    """
+    global _wal_records, _wal_flush_handle
+    _wal_buffer.extend(json_dumps({'uid': user_id, 'status': users_data[user_id]}) + b'\n')
+    _wal_records += 1
+    _dirty_event.set()
+
+    if _wal_flush_handle is None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            _flush_wal()  # No loop (startup, atexit) - write right away
+            return
+        _wal_flush_handle = loop.call_later(WAL_FLUSH_DELAY_SECONDS, _flush_wal)
+
+
+def _flush_wal():
+    """Write buffered WAL records to USERS_WAL_FILE (kept for a retry on failure)"""
+    global _wal_file, _wal_flush_handle
+    _wal_flush_handle = None
+    if not _wal_buffer:
+        return
+    try:
+        if _wal_file is None:
+            _wal_file = open(USERS_WAL_FILE, 'ab', buffering=0)
+        _wal_file.write(_wal_buffer)
+        _wal_buffer.clear()
+    except Exception as e:
+        logger.error("WAL append failed: %s", e)
+
+
+def _write_snapshot(data: bytes):
+    """Atomically replace USERS_FILE with data (blocking - safe to run in a worker thread)
+
+    os.replace() alone keeps readers from ever seeing a half-written file. The fsync
+    (DURABLE_SAVE, on by default) additionally makes sure the new snapshot survives a
+    power loss - without it a crash right after compaction can lose recent changes.
+    """
+    # Write to temporary file first
+    temp_file = USERS_FILE + '.tmp'
     try:
-        # Write to temporary file first
-        temp_file = USERS_FILE + '.tmp'
-        with open(temp_file, 'w') as f:
-            # TYPE FIX: Convert int keys → string for JSON
-            save_data = {str(k): v for k, v in users_data.items()}
-            json.dump(save_data, f, indent=2)
-            f.flush()
-            os.fsync(f.fileno())  # Ensure data is written to disk
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+            if DURABLE_SAVE:
+                f.flush()
+                os.fsync(f.fileno())  # Ensure data is written to disk
 
         # Atomic rename (overwrites USERS_FILE)
         os.replace(temp_file, USERS_FILE)
-        logger.debug(f"Saved {len(users_data)} users")
-    except Exception as e:
-        logger.error(f"Save failed: {e}")
+        if DURABLE_SAVE:
+            fsync_dir(os.path.dirname(USERS_FILE))  # Persist the rename itself
+    except Exception:
         # Clean up temp file if it exists
         if os.path.exists(temp_file):
             try:
                 os.remove(temp_file)
             except:
                 pass
+        raise
 
 
-def get_user_status(user_id: int) -> Dict:
-    global users_data
-    logger.debug(f"get_user_status({user_id}): {len(users_data)} users in cache")
+def _truncate_wal():
+    """Drop all WAL records - only call once the snapshot contains them"""
+    global _wal_records
+    _wal_buffer.clear()
+    if _wal_file is not None:
+        _wal_file.truncate(0)
+    elif os.path.exists(USERS_WAL_FILE):
+        os.remove(USERS_WAL_FILE)
+    _wal_records = 0
 
-    if not users_data:
-        load_users_data()
-        logger.debug(f"Loaded {len(users_data)} users from file")
-
-    if user_id not in users_data:
-        logger.info(f"🆕 New user {user_id} registered")
-        users_data[user_id] = {
-            'completed_quali': None,
-            'group': None,
-            'notifications': get_default_notification_preferences(),
-            'custom_notifications': get_default_custom_notifications(),
-            'gpro_lang': DEFAULT_USER_LANG,
-            'ui_lang': 'en'  # Default UI language (separate from GPRO links language)
-        }
+
+def _snapshot_changed(data: bytes) -> Optional[bytes]:
+    """Digest of data if it differs from the last written snapshot, else None
+
+    Changes that cancel out within a coalescing window (e.g. toggling a
+    notification off and on again) then skip the write and fsync entirely.
+    """
+    digest = _digest(data)
+    return None if digest == _snapshot_digest else digest
+
+
+def _write_snapshot_if_changed(data: bytes) -> Optional[bytes]:
+    """Write data as the snapshot unless it matches the one on disk (blocking)
+
+    Returns:
+        Optional[bytes]: Digest of the written snapshot, None if unchanged
+    """
+    digest = _snapshot_changed(data)
+    if digest is not None:
+        _write_snapshot(data)
+    return digest
+
+
+def save_users_data():
+    """Save full snapshot with atomic write to prevent corruption, then truncate the WAL"""
+    global _snapshot_digest
+    try:
+        # TYPE FIX: int keys are written as JSON strings (no str() rebuild needed)
+        digest = _write_snapshot_if_changed(json_dumps(users_data))
+        if digest is not None:
+            _snapshot_digest = digest
+        # Snapshot now contains everything the WAL had
+        _truncate_wal()
+        logger.debug("Saved %d users", len(users_data))
+    except Exception as e:
+        logger.error(f"Save failed: {e}")
+
+
+async def save_users_data_async() -> bool:
+    """Async counterpart of save_users_data() for use on the event loop
+
+    Serializes on the loop thread (consistent snapshot), then hashes, writes
+    and fsyncs in a worker thread so other handlers keep running meanwhile.
+
+    Returns:
+        bool: True if the snapshot is up to date (written or unchanged)
+    """
+    global _snapshot_digest
+    records_at_snapshot = _wal_records
+    data = json_dumps(users_data)
+    try:
+        digest = await asyncio.to_thread(_write_snapshot_if_changed, data)
+    except Exception as e:
+        logger.error(f"Save failed: {e}")
+        return False
+    if digest is not None:
+        _snapshot_digest = digest
+
+    # Records appended during the write are not in the snapshot - keep the WAL
+    # (replaying full-record entries over a newer snapshot is harmless) and let
+    # the event they set trigger the next compaction
+    if _wal_records == records_at_snapshot:
+        _truncate_wal()
+    logger.debug("Saved %d users", len(users_data))
+    return True
+
+
+async def _compact_users_data_periodically():
+    """Background task: fold the WAL into the snapshot, coalescing bursts of changes
+
+    Sleeps until save_user() marks data dirty, then waits WAL_COMPACT_INTERVAL_SECONDS
+    so every change in that window lands in a single snapshot write.
+    """
+    global _compaction_save
+    while True:
+        await _dirty_event.wait()
+        await asyncio.sleep(WAL_COMPACT_INTERVAL_SECONDS)
+        _dirty_event.clear()
+
+        logger.debug("Compacting %d WAL records into snapshot", _wal_records)
+        # Shielded - cancelling the loop must not abandon a snapshot write
+        # that is still running in its worker thread
+        _compaction_save = asyncio.ensure_future(save_users_data_async())
+        if not await asyncio.shield(_compaction_save):
+            _dirty_event.set()  # Retry on the next cycle
+
+
+def _log_compactor_exit(task: asyncio.Task):
+    """Surface a compaction loop that died instead of losing its exception"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("WAL compaction task stopped: %s", task.exception())
+
+
+def start_users_data_compactor() -> asyncio.Task:
+    """Launch _compact_users_data_periodically() as a background task
+
+    Only one loop may run per process - if it is already running, that
+    task is returned instead of starting a duplicate.
+
+    Returns:
+        asyncio.Task: The running compaction task
+    """
+    global _compactor_task
+    if _compactor_task is not None and not _compactor_task.done():
+        logger.warning("WAL compaction already running, not starting another")
+        return _compactor_task
+
+    _compactor_task = asyncio.create_task(_compact_users_data_periodically())
+    _compactor_task.add_done_callback(_log_compactor_exit)
+    return _compactor_task
+
+
+async def stop_users_data_compactor():
+    """Cancel the compaction task and wait for it (and any save it started) to finish"""
+    global _compactor_task
+    task, _compactor_task = _compactor_task, None
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    if _compaction_save is not None and not _compaction_save.done():
+        await asyncio.wait([_compaction_save])
+
+
+def flush_users_data():
+    """Fold any pending WAL records into the snapshot and close the WAL handle
+
+    Registered with atexit so a clean shutdown leaves a compacted snapshot.
+    """
+    global _wal_file
+    if _loaded and _wal_records:
         save_users_data()
-    else:
-        # Ensure existing users have required fields (migration)
-        # Batch migrations to avoid multiple saves
-        needs_save = False
-        if 'group' not in users_data[user_id]:
-            users_data[user_id]['group'] = None
-            logger.debug(f"Added 'group' field to user {user_id}")
-            needs_save = True
-        if 'notifications' not in users_data[user_id]:
-            users_data[user_id]['notifications'] = get_default_notification_preferences()
-            logger.debug(f"Added 'notifications' field to user {user_id}")
-            needs_save = True
-        if 'custom_notifications' not in users_data[user_id]:
-            users_data[user_id]['custom_notifications'] = get_default_custom_notifications()
-            logger.debug(f"Added 'custom_notifications' field to user {user_id}")
-            needs_save = True
-        if 'gpro_lang' not in users_data[user_id]:
-            users_data[user_id]['gpro_lang'] = DEFAULT_USER_LANG
-            logger.debug(f"Added 'gpro_lang' field to user {user_id}")
-            needs_save = True
-        if 'ui_lang' not in users_data[user_id]:
-            users_data[user_id]['ui_lang'] = 'en'
-            logger.debug(f"Added 'ui_lang' field to user {user_id}")
-            needs_save = True
-
-        # Save only once if any migrations were applied
-        if needs_save:
-            save_users_data()
-
-    return users_data[user_id]
+    _flush_wal()  # Only left non-empty if the snapshot write failed
+    if _wal_file is not None:
+        _wal_file.close()
+        _wal_file = None
+
+
+atexit.register(flush_users_data)
+
+
+def get_user_status_fast(user_id: int) -> Optional[Dict]:
+    """Return a user's record without registering them (None if unknown)
+
+    For read-only hot paths - records are loaded and migrated up front, so
+    there is nothing to ensure here.
+    """
+    return users_data.get(user_id)
+
+
+def _ensure_user_exists(user_id: int) -> Tuple[Dict, bool]:
+    """Return a user's record, creating it in memory if needed - does NOT save
+
+    Mutators use this so a first touch costs one WAL append (theirs) instead
+    of two.
+
+    Returns:
+        tuple: (user_status, created)
+    """
+    # Load from disk exactly once - an empty dict is a valid state (no users yet)
+    if not _loaded:
+        load_users_data()
+
+    user_status = users_data.get(user_id)
+    if user_status is not None:
+        # Legacy records were already migrated in load_users_data()
+        return user_status, False
+
+    logger.info("🆕 New user %d registered", user_id)
+    user_status = users_data[user_id] = {
+        'completed_quali': None,
+        'group': None,
+        'notif_mask': ALL_NOTIFICATIONS_MASK,
+        'custom_notifications': get_default_custom_notifications(),
+        'gpro_lang': DEFAULT_USER_LANG,
+        'ui_lang': 'en'  # Default UI language (separate from GPRO links language)
+    }
+    return user_status, True
+
+
+def get_user_status(user_id: int) -> Dict:
+    logger.debug("get_user_status(%d): %d users in cache", user_id, len(users_data))
+    user_status, created = _ensure_user_exists(user_id)
+    if created:
+        # Broadcasts iterate users_data, so new users must survive a restart
+        save_user(user_id)
+    return user_status
 
 
 def set_user_group(user_id: int, group: str):
     """Set user's GPRO group for race links"""
-    get_user_status(user_id)
-    users_data[user_id]['group'] = group
-    save_users_data()
-    logger.info(f"User {user_id} set group to: {group}")
+    user_status, created = _ensure_user_exists(user_id)
+    if user_status.get('group') == group:
+        if created:
+            save_user(user_id)
+        return  # Unchanged - skip the WAL append
+    user_status['group'] = sys.intern(group) if group else group
+    save_user(user_id)
+    logger.info("User %d set group to: %s", user_id, group)
 
 
-def toggle_notification(user_id: int, notification_type: str):
-    """Toggle a specific notification type for a user"""
-    user_status = get_user_status(user_id)
-    current_state = user_status['notifications'].get(notification_type, True)
-    user_status['notifications'][notification_type] = not current_state
-    save_users_data()
-    new_state = "enabled" if not current_state else "disabled"
-    logger.info(f"User {user_id} {new_state} '{notification_type}' notifications")
-    return not current_state
+def toggle_notification(user_id: int, notification_type: str) -> Optional[bool]:
+    """Toggle a specific notification type for a user
+
+    Returns:
+        Optional[bool]: New state, or None if notification_type is unknown
+    """
+    user_status, created = _ensure_user_exists(user_id)
+    bit = NOTIFICATION_BITS.get(notification_type)
+    if bit is None:
+        # Callback data is client-supplied - ignore types we don't know
+        logger.warning("User %d tried to toggle unknown notification type '%s'", user_id, notification_type)
+        if created:
+            save_user(user_id)
+        return None
+    user_status['notif_mask'] ^= bit
+    new_state = bool(user_status['notif_mask'] & bit)
+    _index_notification_preferences(user_id, user_status)
+    save_user(user_id)
+    logger.info("User %d %s '%s' notifications", user_id,
+                "enabled" if new_state else "disabled", notification_type)
+    return new_state
+
+
+def set_all_notifications(user_id: int, enabled: bool):
+    """Enable or disable every notification type for a user"""
+    user_status, created = _ensure_user_exists(user_id)
+    mask = ALL_NOTIFICATIONS_MASK if enabled else 0
+    if user_status['notif_mask'] == mask:
+        if created:
+            save_user(user_id)
+        return  # Already in the requested state
+    user_status['notif_mask'] = mask
+    _index_notification_preferences(user_id, user_status)
+    save_user(user_id)
+    logger.info("User %d %s all notifications", user_id, "enabled" if enabled else "disabled")
+
+
+def set_custom_notification_slot(user_id: int, slot_idx: int, hours_before: Optional[float]):
+    """Store one custom reminder slot (hours_before None disables it) - callers validate first"""
+    user_status, created = _ensure_user_exists(user_id)
+    if hours_before is None:
+        slot = {'enabled': False, 'hours_before': None}
+    else:
+        slot = {'enabled': True, 'hours_before': hours_before}
+
+    custom_notifs = user_status.setdefault('custom_notifications', get_default_custom_notifications())
+    if slot_idx < len(custom_notifs) and custom_notifs[slot_idx] == slot:
+        if created:
+            save_user(user_id)
+        return  # Unchanged - skip the WAL append
+    while len(custom_notifs) <= slot_idx:
+        custom_notifs.append({'enabled': False, 'hours_before': None})
+    custom_notifs[slot_idx] = slot
+    _index_custom_notifications(user_id, user_status)
+    save_user(user_id)
 
 
 def is_notification_enabled(user_id: int, notification_type: str) -> bool:
     """Check if a notification type is enabled for a user"""
-    user_status = get_user_status(user_id)
-    return user_status['notifications'].get(notification_type, True)
+    return user_id not in get_disabled_users(notification_type)
 
 
 def is_valid_language(lang_code: str) -> bool:
     """Validate language code against supported languages"""
-    return lang_code in LANGUAGE_OPTIONS
+    return lang_code in _VALID_LANG_CODES
 
 
 def set_user_language(user_id: int, lang: str) -> bool:
@@ -183,13 +631,17 @@ def set_user_language(user_id: int, lang: str) -> bool:
     """
     lang = lang.strip().lower()
     if not is_valid_language(lang):
-        logger.warning(f"Invalid language code: {lang}")
+        logger.warning("Invalid language code: %s", lang)
         return False
 
-    get_user_status(user_id)
-    users_data[user_id]['gpro_lang'] = lang
-    save_users_data()
-    logger.info(f"User {user_id} set language to: {lang}")
+    user_status, created = _ensure_user_exists(user_id)
+    if user_status.get('gpro_lang') == lang:
+        if created:
+            save_user(user_id)
+        return True  # Unchanged - skip the WAL append
+    user_status['gpro_lang'] = sys.intern(lang)
+    save_user(user_id)
+    logger.info("User %d set language to: %s", user_id, lang)
     return True
 
 
@@ -221,13 +673,17 @@ def set_user_ui_language(user_id: int, lang: str) -> bool:
     lang = lang.strip().lower()
 
     if lang not in valid_ui_langs:
-        logger.warning(f"Invalid UI language code: {lang}")
+        logger.warning("Invalid UI language code: %s", lang)
         return False
 
-    get_user_status(user_id)
-    users_data[user_id]['ui_lang'] = lang
-    save_users_data()
-    logger.info(f"User {user_id} set UI language to: {lang}")
+    user_status, created = _ensure_user_exists(user_id)
+    if user_status.get('ui_lang') == lang:
+        if created:
+            save_user(user_id)
+        return True  # Unchanged - skip the WAL append
+    user_status['ui_lang'] = sys.intern(lang)
+    save_user(user_id)
+    logger.info("User %d set UI language to: %s", user_id, lang)
     return True
 
 
@@ -245,17 +701,19 @@ def get_user_ui_language(user_id: int) -> str:
 
 
 def mark_quali_done(user_id: int, race_id: int):
-    get_user_status(user_id)
-    users_data[user_id]['completed_quali'] = race_id
-    save_users_data()
-    logger.info(f"User {user_id} marked race {race_id} done")
+    user_status, created = _ensure_user_exists(user_id)
+    if user_status.get('completed_quali') == race_id:
+        if created:
+            save_user(user_id)
+        return  # Double-tap on the done button
+    user_status['completed_quali'] = race_id
+    save_user(user_id)
+    logger.info("User %d marked race %d done", user_id, race_id)
 
 
 def reset_user_status(user_id: int):
-    if user_id in users_data:
-        users_data[user_id]['completed_quali'] = None
-        save_users_data()
-        logger.info(f"User {user_id} reset")
-
-
-load_users_data()
+    user_status = users_data.get(user_id)
+    if user_status is not None and user_status.get('completed_quali') is not None:
+        user_status['completed_quali'] = None
+        save_user(user_id)
+        logger.info("User %d reset", user_id)
@@ -9,6 +9,11 @@ CUSTOM_NOTIF_MIN_HOURS = 20 / 60  # 20 minutes minimum
 CUSTOM_NOTIF_MAX_HOURS = 70  # 70 hours maximum
 CUSTOM_NOTIF_MAX_SLOTS = 2  # Maximum 2 custom notifications per user
 
+# Time input formats (matched against stripped, lower-cased input)
+_HOURS_MINUTES_RE = re.compile(r'^(\d+)\s*h(?:ours?)?\s*(\d+)\s*m(?:in(?:utes?)?)?$')  # "1h 30m", "2h30m"
+_HOURS_RE = re.compile(r'^(\d+)\s*h(?:ours?)?$')  # "2h", "12 hours"
+_MINUTES_RE = re.compile(r'^(\d+)\s*m(?:in(?:utes?)?)?$')  # "20m", "45 minutes"
+
 
 def validate_custom_notification_hours(hours: float, i18n=None) -> tuple[bool, str]:
     """Validate custom notification time
@@ -81,7 +86,7 @@ def parse_time_input(time_str: str, i18n=None) -> tuple[float, str]:
     time_str = time_str.strip().lower()
 
     # Try to match "Xh Ym" or "XhYm" format
-    match = re.match(r'^(\d+)\s*h(?:ours?)?\s*(\d+)\s*m(?:in(?:utes?)?)?$', time_str)
+    match = _HOURS_MINUTES_RE.match(time_str)
     if match:
         hours = int(match.group(1))
         minutes = int(match.group(2))
@@ -89,13 +94,13 @@ def parse_time_input(time_str: str, i18n=None) -> tuple[float, str]:
         return total_hours, ""
 
     # Try to match hours only: "Xh" or "X hours"
-    match = re.match(r'^(\d+)\s*h(?:ours?)?$', time_str)
+    match = _HOURS_RE.match(time_str)
     if match:
         hours = int(match.group(1))
         return float(hours), ""
 
     # Try to match minutes only: "Xm" or "X minutes"
-    match = re.match(r'^(\d+)\s*m(?:in(?:utes?)?)?$', time_str)
+    match = _MINUTES_RE.match(time_str)
     if match:
         minutes = int(match.group(1))
         return minutes / 60, ""
@@ -199,23 +204,9 @@ def set_custom_notification(user_id: int, slot: int, hours_before: float, i18n=N
         if not is_valid:
             return False, error_msg
 
-    from .user_data import get_user_status, get_default_custom_notifications, save_users_data
-    user_status = get_user_status(user_id)
-    custom_notifs = user_status.get('custom_notifications', get_default_custom_notifications())
-
-    # Ensure list has correct size
-    while len(custom_notifs) < CUSTOM_NOTIF_MAX_SLOTS:
-        custom_notifs.append({'enabled': False, 'hours_before': None})
-
-    # Update slot
-    if hours_before is None:
-        custom_notifs[slot] = {'enabled': False, 'hours_before': None}
-    else:
-        custom_notifs[slot] = {'enabled': True, 'hours_before': hours_before}
-
-    user_status['custom_notifications'] = custom_notifs
-    save_users_data()
+    from .user_data import set_custom_notification_slot
+    set_custom_notification_slot(user_id, slot, hours_before)
 
     time_str = format_custom_notification_time(hours_before, i18n)
-    logger.info(f"User {user_id} set custom notification {slot+1} to: {time_str}")
+    logger.info("User %d set custom notification %d to: %s", user_id, slot + 1, time_str)
     return True, get_text("custom-notif-set", slot=slot+1, time=time_str)
@@ -0,0 +1,127 @@
+"""Notification checker: fired events survive a failed send phase
+
+Run with: python -m unittest discover tests
+"""
+import os
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+# config.py refuses to import without these
+os.environ.setdefault('TELEGRAM_BOT_TOKEN', 'test')
+os.environ.setdefault('GPRO_API_TOKEN', 'test')
+os.environ.setdefault('ADMIN_USER_ID', '1')
+
+import gpro_calendar
+from notifications import checker
+from notifications.user_data import users_data
+
+USER_ID = 42
+T0 = datetime(2026, 3, 1, 19, 0)
+
+
+def _fail_once(func):
+    """Wrap func so its first call raises RuntimeError"""
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("send phase failed")
+        return func(*args, **kwargs)
+    return wrapper
+
+
+class FailedSendRetryTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        # Race 1 starts at T0, race 2's quali opens after it
+        gpro_calendar._set_race_calendar({
+            1: {'track': 'Monza (Italy)', 'date': T0, 'quali_close': T0 - timedelta(hours=1, minutes=30)},
+            2: {'track': 'Spa (Belgium)', 'date': T0 + timedelta(days=3),
+                'quali_close': T0 + timedelta(days=3, hours=-1, minutes=-30)},
+        })
+        users_data[USER_ID] = {
+            'completed_quali': None, 'group': None, 'notif_mask': 0xFF,
+            'custom_notifications': [], 'gpro_lang': 'gb', 'ui_lang': 'en'
+        }
+        checker.notify_history.clear()
+        checker.last_api_check_mono = None
+        checker._events_version = None  # Force the event heaps to rebuild
+
+        self.delivered = []
+
+        async def send(bot, user_id, message, keyboard=None):
+            self.delivered.append(user_id)
+            return True
+
+        async def unthrottled(send_coro):
+            return await send_coro
+
+        async def no_save():
+            pass
+
+        for target, value in (('send_rendered_notification', send), ('_send_rate_limited', unthrottled),
+                              ('_save_notify_history', no_save)):
+            patcher = patch.object(checker, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        users_data.pop(USER_ID, None)
+        gpro_calendar._set_race_calendar({})
+
+    async def _tick(self, now: datetime, mono_now: float):
+        """One checker cycle - detection, then a send phase that may raise"""
+        notifications = (checker._check_quali_closing_notifications(now)
+                         + await checker._check_quali_open_notifications(now, mono_now)
+                         + checker._check_race_live_notifications(now))
+        try:
+            await checker._send_notifications_to_users(None, notifications, now)
+        except RuntimeError:
+            pass
+
+    async def test_closing_reminder_retried_after_failed_send(self):
+        close = gpro_calendar.race_calendar[2]['quali_close']
+        failing = _fail_once(checker.render_quali_notification)
+        with patch.object(checker, 'render_quali_notification', failing):
+            await self._tick(close - timedelta(hours=2), 0.0)
+            self.assertEqual(self.delivered, [])
+            await self._tick(close - timedelta(hours=2) + timedelta(minutes=1), 60.0)
+        self.assertEqual(self.delivered, [USER_ID])
+        self.assertIn((2, '2h'), checker.notify_history)
+
+    async def test_race_live_retried_after_failed_send(self):
+        failing = _fail_once(checker._GROUP_RENDERERS['live'])
+        with patch.dict(checker._GROUP_RENDERERS, {'live': failing}):
+            await self._tick(T0, 0.0)
+            self.assertEqual(self.delivered, [])
+            await self._tick(T0 + timedelta(minutes=1), 60.0)
+        self.assertEqual(self.delivered, [USER_ID])
+        self.assertIn((1, 'race_live'), checker.notify_history)
+
+    async def test_quali_open_retried_after_failed_send(self):
+        api_calls = []
+
+        async def quali_status():
+            api_calls.append(1)
+            return {2: {}}
+
+        async def weather(race_id):
+            return {'q1Temp': 20}  # Truthy, so there is no retry delay
+
+        failing = _fail_once(checker.render_quali_notification)
+        now = T0 + timedelta(hours=2, minutes=5)
+        with patch.object(checker, 'check_quali_status_from_api', quali_status), \
+                patch.object(checker, 'fetch_weather_from_api', weather), \
+                patch.object(checker, 'render_quali_notification', failing):
+            await self._tick(now, 0.0)
+            self.assertNotIn((2, 'opens_soon'), checker.notify_history)
+            # Within the API rate limit - the earlier confirmation is reused
+            await self._tick(now + timedelta(minutes=1), 60.0)
+        self.assertEqual(len(api_calls), 1)
+        self.assertIn((2, 'opens_soon'), checker.notify_history)
+        self.assertIn(USER_ID, self.delivered)
+
+
+if __name__ == '__main__':
+    unittest.main()
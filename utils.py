@@ -1,8 +1,57 @@
 """Shared utility functions for GPRO Bot"""
 import pycountry
+import json
 import math
+import os
 import re
+import string
 from datetime import datetime
+from functools import lru_cache
+
+try:
+    import orjson  # Optional - much faster (de)serialization of the JSON data files
+except ImportError:
+    orjson = None
+
+# Stdlib fallback encoder - built once, json.dumps() with custom separators
+# would construct a new JSONEncoder on every call
+_JSON_ENCODER = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+
+def json_dumps(obj) -> bytes:
+    """Serialize to compact JSON bytes (int dict keys are written as strings)"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return _JSON_ENCODER.encode(obj).encode('utf-8')
+
+
+def json_loads(data: bytes):
+    """Parse JSON bytes - raises ValueError on malformed input"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def fsync_dir(path: str):
+    """fsync a directory so a rename inside it survives power loss (no-op where unsupported)"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return  # Windows - directories can't be opened for fsync
+    dir_fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+# Regional indicator symbols start at 0x1F1E6 (for 'A') - every two-letter
+# combination is pre-built, so a flag is a single dict lookup
+_REGIONAL_INDICATOR_A = 0x1F1E6
+_FLAG_TABLE = {
+    first + second: chr(_REGIONAL_INDICATOR_A + ord(first) - ord('A'))
+                    + chr(_REGIONAL_INDICATOR_A + ord(second) - ord('A'))
+    for first in string.ascii_uppercase
+    for second in string.ascii_uppercase
+}
 
 
 def country_code_to_flag(country_code: str) -> str:
@@ -18,23 +67,16 @@ def country_code_to_flag(country_code: str) -> str:
     """
     if not country_code or len(country_code) != 2:
         return ""
-
-    # Regional indicator symbols start at 0x1F1E6 (for 'A')
-    REGIONAL_INDICATOR_A = 0x1F1E6
-    country_code = country_code.upper()
-
-    try:
-        flag = "".join(chr(REGIONAL_INDICATOR_A + ord(char) - ord('A')) for char in country_code)
-        return flag
-    except (ValueError, TypeError):
-        return ""
+    return _FLAG_TABLE.get(country_code.upper(), "")
 
 
+@lru_cache(maxsize=256)
 def get_country_iso_code(country_name: str) -> str:
     """Automatically get ISO code for any country name using pycountry
 
     Handles variations and common names automatically.
     Returns empty string if country not found.
+    Cached - pycountry's lookups (fuzzy search especially) walk its whole database.
     """
     if not country_name:
         return ""
@@ -58,9 +100,13 @@ def get_country_iso_code(country_name: str) -> str:
     return ""
 
 
+@lru_cache(maxsize=256)
 def add_flag_to_track(track: str) -> str:
     """Replace country name in parentheses with flag emoji
 
+    Cached - GPRO has a small fixed set of tracks, and every notification
+    and calendar listing formats them again.
+
     Automatically detects country and converts to flag emoji.
     Works for any country without needing manual mapping.
 
@@ -203,6 +249,12 @@ def format_race_beautiful(race_data: dict) -> str:
     return f"Qualification closes in {hours_display}h\n**({deadline})** - {track}"
 
 
+@lru_cache(maxsize=64)
+def _format_race_day(race_date: datetime) -> str:
+    """Short race day label for calendar listings (cached - race dates are fixed per season)"""
+    return race_date.strftime("%a %d.%m")
+
+
 def format_full_calendar(calendar_data: dict, title: str = "Full Season", is_current_season: bool = True, i18n=None) -> str:
     """Generic formatter for current/next season
 
@@ -245,7 +297,7 @@ def format_full_calendar(calendar_data: dict, title: str = "Full Season", is_cur
         quali_close = race.get('quali_close', now)
         race_id = race['race_id']
 
-        date_str = race_date.strftime("%a %d.%m")
+        date_str = _format_race_day(race_date)
         time_text = format_time_until_quali(quali_close, i18n)
 
         time_info = date_str